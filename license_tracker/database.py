@@ -0,0 +1,294 @@
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from types import TracebackType
+from typing import Iterator, NamedTuple, Optional
+
+from httpx import URL
+
+from license_tracker import models
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dependencies (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL,
+    name TEXT NOT NULL,
+    version TEXT NOT NULL,
+    license_name TEXT,
+    summary TEXT,
+    project_url TEXT,
+    UNIQUE (key, version)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    sha TEXT PRIMARY KEY,
+    content BLOB NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS licenses (
+    dependency_id INTEGER NOT NULL REFERENCES dependencies (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    filename TEXT NOT NULL,
+    url TEXT NOT NULL,
+    sha TEXT NOT NULL REFERENCES blobs (sha),
+    PRIMARY KEY (dependency_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS dependencies_license_name
+    ON dependencies (license_name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS licenses_sha ON licenses (sha, dependency_id);
+"""
+
+
+class Record(NamedTuple):
+    """
+    Lightweight view of stored dependency, without license contents
+    """
+
+    name: str
+    version: str
+    license_name: Optional[str]
+    shas: frozenset[str]
+
+
+class LicenseChange(NamedTuple):
+    previous: Record
+    current: Record
+
+
+class LicenseDatabase:
+    """
+    Single file store of resolved dependencies that can be shipped to hosts
+    without internet access.
+
+    License contents are compressed and stored once per sha, dependencies are
+    looked up by their normalized name and version.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # dependencies are resolved from worker threads, access is serialized
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.executescript(SCHEMA)
+
+    def __enter__(self) -> "LicenseDatabase":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    @staticmethod
+    def normalize(name: str) -> str:
+        # https://peps.python.org/pep-0503/#normalized-names
+        return re.sub(r"[-_.]+", "-", name).lower()
+
+    def add(self, dependency: models.Dependency) -> None:
+        with self.lock, self.connection:
+            self.connection.execute(
+                "DELETE FROM dependencies WHERE key = ? AND version = ?",
+                (self.normalize(dependency.name), dependency.version),
+            )
+            cursor = self.connection.execute(
+                "INSERT INTO dependencies "
+                "(key, name, version, license_name, summary, project_url) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    self.normalize(dependency.name),
+                    dependency.name,
+                    dependency.version,
+                    dependency.license_name,
+                    dependency.summary,
+                    str(dependency.project_url),
+                ),
+            )
+            for position, license_ in enumerate(dependency.licenses):
+                self.connection.execute(
+                    "INSERT OR IGNORE INTO blobs (sha, content) VALUES (?, ?)",
+                    (license_.sha, zlib.compress(license_.raw_content.encode())),
+                )
+                self.connection.execute(
+                    "INSERT INTO licenses "
+                    "(dependency_id, position, filename, url, sha) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (
+                        cursor.lastrowid,
+                        position,
+                        license_.filename,
+                        str(license_.url),
+                        license_.sha,
+                    ),
+                )
+
+    def get(
+        self, name: str, version: Optional[str] = None
+    ) -> Optional[models.Dependency]:
+        """
+        Return stored dependency, when version is not given the most recently
+        stored one is returned.
+        """
+
+        with self.lock:
+            if version:
+                row = self.connection.execute(
+                    "SELECT * FROM dependencies WHERE key = ? AND version = ?",
+                    (self.normalize(name), version),
+                ).fetchone()
+            else:
+                row = self.connection.execute(
+                    "SELECT * FROM dependencies WHERE key = ? "
+                    "ORDER BY id DESC LIMIT 1",
+                    (self.normalize(name),),
+                ).fetchone()
+            if row is None:
+                return None
+            return self._build_dependency(row)
+
+    def __iter__(self) -> Iterator[models.Dependency]:
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT * FROM dependencies ORDER BY id"
+            ).fetchall()
+        for row in rows:
+            with self.lock:
+                dependency = self._build_dependency(row)
+            yield dependency
+
+    def __len__(self) -> int:
+        with self.lock:
+            (count,) = self.connection.execute(
+                "SELECT COUNT(*) FROM dependencies"
+            ).fetchone()
+        return int(count)
+
+    def records(
+        self,
+        *,
+        name: Optional[str] = None,
+        license_name: Optional[str] = None,
+        sha: Optional[str] = None,
+    ) -> list[Record]:
+        """
+        Return stored dependencies matching all given filters. License name
+        can contain * and ? wildcards, it's matched case insensitively.
+        """
+
+        conditions, params = [], []
+        if name:
+            conditions.append("d.key = ?")
+            params.append(self.normalize(name))
+        if license_name and any(char in license_name for char in "*?"):
+            conditions.append("d.license_name LIKE ? ESCAPE '\\'")
+            params.append(
+                re.sub(r"([%_\\])", r"\\\1", license_name)
+                .replace("*", "%")
+                .replace("?", "_")
+            )
+        elif license_name:
+            conditions.append("d.license_name = ? COLLATE NOCASE")
+            params.append(license_name)
+        if sha:
+            conditions.append(
+                "d.id IN (SELECT dependency_id FROM licenses WHERE sha = ?)"
+            )
+            params.append(sha)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT d.name, d.version, d.license_name, GROUP_CONCAT(l.sha) "
+                "FROM dependencies d "
+                "LEFT JOIN licenses l ON l.dependency_id = d.id "
+                f"{where} GROUP BY d.id ORDER BY d.key, d.id",
+                params,
+            ).fetchall()
+        return [
+            Record(
+                name, version, license_name, frozenset((shas or "").split(",")) - {""}
+            )
+            for name, version, license_name, shas in rows
+        ]
+
+    def license_changes(
+        self,
+        name: Optional[str] = None,
+        license_name: Optional[str] = None,
+        sha: Optional[str] = None,
+    ) -> list[LicenseChange]:
+        """
+        Return consecutive versions of the same dependency that don't share
+        the same set of license files (compared by sha) or license name. When
+        license name or sha is given, only changes from or to a version
+        matching them are returned.
+        """
+
+        matching = None
+        if license_name or sha:
+            matching = {
+                (self.normalize(record.name), record.version)
+                for record in self.records(
+                    name=name, license_name=license_name, sha=sha
+                )
+            }
+        changes = []
+        by_name: dict[str, list[Record]] = {}
+        for record in self.records(name=name):
+            by_name.setdefault(self.normalize(record.name), []).append(record)
+        for key, records in by_name.items():
+            records.sort(key=lambda x: models.version_key(x.version))
+            for previous, current in zip(records, records[1:]):
+                if (previous.shas, previous.license_name) == (
+                    current.shas,
+                    current.license_name,
+                ):
+                    continue
+                if (
+                    matching is None
+                    or {
+                        (key, previous.version),
+                        (key, current.version),
+                    }
+                    & matching
+                ):
+                    changes.append(LicenseChange(previous, current))
+        return changes
+
+    def merge(self, other: "LicenseDatabase") -> int:
+        count = 0
+        for dependency in other:
+            self.add(dependency)
+            count += 1
+        return count
+
+    def _build_dependency(self, row: tuple[str, ...]) -> models.Dependency:
+        dependency_id, _key, name, version, license_name, summary, project_url = row
+        licenses = [
+            models.License(
+                filename,
+                zlib.decompress(content).decode(),
+                URL(url),
+                sha,
+            )
+            for filename, url, sha, content in self.connection.execute(
+                "SELECT filename, url, licenses.sha, content FROM licenses "
+                "JOIN blobs ON blobs.sha = licenses.sha "
+                "WHERE dependency_id = ? ORDER BY position",
+                (dependency_id,),
+            )
+        ]
+        return models.Dependency(
+            name=name,
+            version=version,
+            license_name=license_name,
+            summary=summary,
+            project_url=URL(project_url),
+            licenses=licenses,
+        )
@@ -1,10 +1,14 @@
-from typing import Optional
+import httpx
 
 
-class NoLicenseFound(Exception):
-    def __init__(
-        self, message: str, *, name: Optional[str] = None, version: str
-    ) -> None:
-        super().__init__(message)
-        self.dependency_name = name
-        self.dependency_version = version
+class QueryTooExpensive(Exception):
+    """
+    Raised when GitHub refuses GraphQL query because of its size or cost
+    """
+
+
+class BudgetExhausted(httpx.HTTPError):
+    """
+    Raised when request would have to wait for rate limit budget of its host
+    longer than allowed
+    """
@@ -1,11 +1,14 @@
 import os
-from typing import Final, MutableMapping, Optional
+import queue
+import threading
+from types import TracebackType
+from typing import Final, Mapping, MutableMapping, Optional, Protocol, Union
 
 from httpx._types import URLTypes
 from rich.console import Console
 from rich.table import Column, Table
 
-from license_tracker.models import Dependency
+from license_tracker.models import Dependency, Resolution
 
 console = Console(record=True)
 
@@ -34,6 +37,14 @@ def as_dict(
     return result
 
 
+Rows = Mapping[str, Optional[URLTypes]]
+
+
+class Exporter(Protocol):
+    def export(self, dependency: Dependency, rows: Rows) -> None:
+        ...
+
+
 class ConsoleExporter:
     def single(
         self, dependencies: list[Dependency], extra_rows: Optional[list[str]] = None
@@ -43,21 +54,27 @@ class ConsoleExporter:
             return None
 
         for dependency in dependencies:
-            table = Table(
-                Column(header="Key", width=30),
-                Column(header="Value", width=120),
-                show_header=False,
-                width=150,
-            )
-            for key, value in as_dict(dependency, extra_rows=extra_rows).items():
-                table.add_row(key, str(value))
-            console.print(table)
+            self.export(dependency, as_dict(dependency, extra_rows=extra_rows))
         return None
 
+    def export(self, dependency: Dependency, rows: Rows) -> None:
+        table = Table(
+            Column(header="Key", width=30),
+            Column(header="Value", width=120),
+            show_header=False,
+            width=150,
+        )
+        for key, value in rows.items():
+            table.add_row(key, str(value))
+        console.print(table)
+
 
 class FileExporter:
     FIRST_COL_LEN: Final[int] = 30
 
+    def __init__(self) -> None:
+        self._directory_created = False
+
     def single(
         self, dependencies: list[Dependency], extra_rows: Optional[list[str]] = None
     ) -> None:
@@ -65,20 +82,23 @@ class FileExporter:
             console.print("No dependencies to export")
             return None
 
-        os.makedirs("output", exist_ok=True)
-
         for dependency in dependencies:
-            filename = (
-                "_".join([dependency.name, *dependency.version.split(".")]) + ".txt"
-            )
-            with open(f"output/{filename}", "w") as f:
-                for key, value in as_dict(dependency, extra_rows=extra_rows).items():
-                    if len(str(value).split("\n")) == 1:
-                        f.writelines(self._format_line(key, str(value)))
-                    else:
-                        f.writelines(self._format_multiline(str(key), str(value)))
+            self.export(dependency, as_dict(dependency, extra_rows=extra_rows))
         return None
 
+    def export(self, dependency: Dependency, rows: Rows) -> None:
+        if not self._directory_created:
+            os.makedirs("output", exist_ok=True)
+            self._directory_created = True
+
+        filename = "_".join([dependency.name, *dependency.version.split(".")]) + ".txt"
+        with open(f"output/{filename}", "w") as f:
+            for key, value in rows.items():
+                if len(str(value).split("\n")) == 1:
+                    f.writelines(self._format_line(key, str(value)))
+                else:
+                    f.writelines(self._format_multiline(str(key), str(value)))
+
     def _format_line(self, key: str, value: str) -> list[str]:
         lines = []
         if len(key) < self.FIRST_COL_LEN - 1:
@@ -122,3 +142,137 @@ class FileExporter:
         for next_line in others:
             results.extend(self._format_line("", str(next_line)))
         return results
+
+
+class ErrorReport:
+    """
+    Collects problems encountered while resolving dependencies, so they can be
+    shown together once everything is processed
+    """
+
+    def __init__(self) -> None:
+        self.resolutions: list[Resolution] = []
+        self._lock = threading.Lock()
+
+    def add(self, resolution: Resolution) -> None:
+        if resolution.errors:
+            with self._lock:
+                self.resolutions.append(resolution)
+
+    def print(self) -> None:
+        if not self.resolutions:
+            return None
+        table = Table("Dependency", "Result", "Stage", "Error", title="Problems found")
+        for resolution in self.resolutions:
+            result = "partial" if resolution.partial else "failed"
+            for error in resolution.errors:
+                table.add_row(str(resolution), result, error.stage.value, error.message)
+        console.print(table)
+        return None
+
+
+class ExportPipeline:
+    """
+    Passes resolved dependencies to exporters running in their own threads.
+
+    Each exporter reads from its own bounded queue, so producers block when
+    exporters can't keep up instead of piling up results in memory. Rows are
+    computed once per dependency and shared by all exporters. Results put with
+    an index are exported in order of their indexes, at most maxsize of them
+    wait for the ones that come before.
+    """
+
+    def __init__(
+        self,
+        exporters: list[Exporter],
+        extra_rows: Optional[list[str]] = None,
+        maxsize: int = 16,
+    ) -> None:
+        self.extra_rows = extra_rows
+        self.maxsize = maxsize
+        self.count = 0
+        self.errors: list[BaseException] = []
+        self._lock = threading.Lock()
+        self._order = threading.Condition()
+        self._next_index = 0
+        self._pending: dict[int, list[Dependency]] = {}
+        # None tells exporter there will be no more dependencies
+        self._queues: list[queue.Queue[Optional[tuple[Dependency, Rows]]]] = [
+            queue.Queue(maxsize) for _ in exporters
+        ]
+        self._threads = [
+            threading.Thread(target=self._consume, args=(exporter, items), daemon=True)
+            for exporter, items in zip(exporters, self._queues)
+        ]
+
+    def __enter__(self) -> "ExportPipeline":
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        for items in self._queues:
+            items.put(None)
+        for thread in self._threads:
+            thread.join()
+        if exc_value is None and self.errors:
+            raise self.errors[0]
+        if exc_value is None and not self.count:
+            console.print("No dependencies to export")
+
+    def put(
+        self,
+        result: Union[Dependency, list[Dependency], None],
+        index: Optional[int] = None,
+    ) -> None:
+        """
+        When index is given every index starting from 0 has to be put exactly
+        once, with None if there is nothing to export.
+        """
+
+        if result is None:
+            dependencies = []
+        else:
+            dependencies = result if isinstance(result, list) else [result]
+        if index is None:
+            self._deliver(dependencies)
+            return None
+        with self._order:
+            # the next index is never held back, so producers can't deadlock
+            self._order.wait_for(
+                lambda: index == self._next_index or len(self._pending) < self.maxsize
+            )
+            self._pending[index] = dependencies
+            while self._next_index in self._pending:
+                self._deliver(self._pending.pop(self._next_index))
+                self._next_index += 1
+            self._order.notify_all()
+        return None
+
+    def _deliver(self, dependencies: list[Dependency]) -> None:
+        for dependency in dependencies:
+            rows = as_dict(dependency, extra_rows=self.extra_rows)
+            with self._lock:
+                self.count += 1
+            for items in self._queues:
+                items.put((dependency, rows))
+
+    def _consume(
+        self,
+        exporter: Exporter,
+        items: "queue.Queue[Optional[tuple[Dependency, Rows]]]",
+    ) -> None:
+        while (item := items.get()) is not None:
+            if self.errors:
+                # keep draining so producers don't block on a full queue
+                continue
+            dependency, rows = item
+            try:
+                exporter.export(dependency, rows)
+            except Exception as e:
+                self.errors.append(e)
@@ -1,7 +1,11 @@
 from dataclasses import dataclass, field
-from typing import Optional
+from enum import Enum
+from typing import Optional, Union
 
 from httpx._types import URLTypes
+from packaging.requirements import InvalidRequirement, Requirement
+from packaging.specifiers import SpecifierSet
+from packaging.version import InvalidVersion, Version
 
 
 @dataclass
@@ -32,3 +36,75 @@ class Dependency:
             # keep it simple, if version is not pinned, then let's assume it's not specified
             name, version = value.strip(), None
         return name.strip(), version.strip() if version else None
+
+    @staticmethod
+    def parse_range(value: str) -> Optional[tuple[str, SpecifierSet]]:
+        """
+        Parse strings like "pkg>=1.0,<2.0", return None for plain or pinned names
+        """
+
+        if not any(operator in value for operator in "<>!~,"):
+            return None
+        try:
+            requirement = Requirement(value.strip())
+        except InvalidRequirement:
+            return None
+        return requirement.name, requirement.specifier
+
+
+class Stage(str, Enum):
+    METADATA = "metadata"
+    REPOSITORY = "repository resolution"
+    TAG = "tag resolution"
+    DOWNLOAD = "download"
+    # anything that wasn't anticipated, recorded so it fails one dependency only
+    UNEXPECTED = "unexpected error"
+
+
+@dataclass
+class StageResult:
+    stage: Stage
+    ok: bool
+    message: str = ""
+
+
+@dataclass
+class Resolution:
+    """
+    Outcome of resolving a single dependency. Stages that failed are recorded
+    instead of raised, dependency is set whenever at least one license file
+    was found - even if fetching some others failed.
+    """
+
+    name: str
+    version: Optional[str]
+    dependency: Optional[Dependency] = None
+    stages: list[StageResult] = field(default_factory=list)
+
+    def __str__(self) -> str:
+        return f"{self.name} ({self.version or 'latest'})"
+
+    def succeeded(self, stage: Stage, message: str = "") -> None:
+        self.stages.append(StageResult(stage, True, message))
+
+    def failed(self, stage: Stage, message: str) -> None:
+        self.stages.append(StageResult(stage, False, message))
+
+    @property
+    def errors(self) -> list[StageResult]:
+        return [result for result in self.stages if not result.ok]
+
+    @property
+    def partial(self) -> bool:
+        return self.dependency is not None and bool(self.errors)
+
+
+def version_key(version: str) -> tuple[int, Union[Version, str]]:
+    """
+    Sort key for versions, the ones not following PEP 440 go first
+    """
+
+    try:
+        return 1, Version(version)
+    except InvalidVersion:
+        return 0, version
@@ -0,0 +1,74 @@
+import fnmatch
+import re
+from dataclasses import dataclass, field
+from typing import Any, Iterable, NamedTuple, Optional
+
+from license_tracker.database import LicenseDatabase, Record
+
+
+class Violation(NamedTuple):
+    record: Record
+    reason: str
+
+
+def _compile(patterns: list[str]) -> Optional[re.Pattern[str]]:
+    # one regex for all the patterns so each record is matched once per list
+    if not patterns:
+        return None
+    return re.compile(
+        "|".join(fnmatch.translate(pattern) for pattern in patterns), re.IGNORECASE
+    )
+
+
+@dataclass
+class Policy:
+    """
+    Allow/deny rules for license names (with * and ? wildcards).
+
+    Denied licenses are always violations, when allowed licenses are given
+    anything not matching them is a violation too. Dependencies without
+    a license name can't be checked against either list, so they are
+    violations as well. Ignored dependencies and license files (by sha) that
+    were reviewed manually are skipped.
+    """
+
+    allow: list[str] = field(default_factory=list)
+    deny: list[str] = field(default_factory=list)
+    ignore: list[str] = field(default_factory=list)
+    ignore_shas: list[str] = field(default_factory=list)
+
+    def __post_init__(self) -> None:
+        self._allow = _compile(self.allow)
+        self._deny = _compile(self.deny)
+        self._ignore = {LicenseDatabase.normalize(name) for name in self.ignore}
+        self._ignore_shas = set(self.ignore_shas)
+
+    @classmethod
+    def from_config(cls, config: dict[str, Any]) -> "Policy":
+        return cls(
+            allow=config.get("allow", []),
+            deny=config.get("deny", []),
+            ignore=config.get("ignore", []),
+            ignore_shas=config.get("ignore_shas", []),
+        )
+
+    def check(self, record: Record) -> Optional[Violation]:
+        if LicenseDatabase.normalize(record.name) in self._ignore:
+            return None
+        if record.shas and record.shas <= self._ignore_shas:
+            return None
+        license_name = (record.license_name or "").strip()
+        if not license_name:
+            return Violation(record, "License name is missing")
+        if self._deny and self._deny.match(license_name):
+            return Violation(record, f"License {license_name!r} is denied")
+        if self._allow and not self._allow.match(license_name):
+            return Violation(record, f"License {license_name!r} is not allowed")
+        return None
+
+    def evaluate(self, records: Iterable[Record]) -> list[Violation]:
+        return [
+            violation
+            for record in records
+            if (violation := self.check(record)) is not None
+        ]
@@ -1,118 +1,741 @@
+import hashlib
+import io
+import json
 import re
-from typing import Final, Optional, Union
+import struct
+import threading
+import zipfile
+import zlib
+from concurrent.futures import Future
+from typing import Any, Callable, Final, NamedTuple, Optional, TypeVar, Union
 
 import httpx
-from httpx import URL, HTTPStatusError, Response
+from httpx import URL, Response
 from httpx._types import URLTypes
+from packaging.specifiers import SpecifierSet
 
 from license_tracker import exceptions, models
+from license_tracker.scheduler import Priority, scheduler
 
+RepositoryRef = tuple[str, str, str]
+T = TypeVar("T")
 
-class GithubClient:
-    def get_licenses(self, project_url: URLTypes, version: str) -> list[models.License]:
+
+class GithubGraphQLClient:
+    """
+    Fetches license files of many repositories using batched GraphQL queries.
+
+    Lookups requested concurrently are collected for a short while and sent
+    together: one query lists root directories of all requested repositories,
+    second one downloads contents of license files found there. Batch size is
+    halved whenever GitHub rejects a query as too expensive.
+    """
+
+    URL: Final[str] = "https://api.github.com/graphql"
+    MAX_BATCH_SIZE: Final[int] = 100
+    # how long to wait for other lookups before sending incomplete batch
+    LINGER: Final[float] = 0.05
+    TREE_FRAGMENT: Final[str] = "... on Tree { entries { name oid type } }"
+    BLOB_FRAGMENT: Final[str] = "... on Blob { oid text isBinary }"
+    COST_ERROR_TYPES: Final[set[str]] = {
+        "MAX_NODE_LIMIT_EXCEEDED",
+        "RESOURCE_LIMITS_EXCEEDED",
+        "EXCESSIVE_PAGINATION",
+    }
+
+    def __init__(self, token: str, url: Optional[str] = None) -> None:
+        self.token = token
+        self.url = url or self.URL
+        self.batch_size = self.MAX_BATCH_SIZE
+        self.lock = threading.Lock()
+        self.futures: dict[RepositoryRef, Future[Optional[list[models.License]]]] = {}
+        self.pending: list[RepositoryRef] = []
+        self.timer: Optional[threading.Timer] = None
+
+    def get_licenses(
+        self, project_url: URLTypes, version: str
+    ) -> Optional[list[models.License]]:
+        """
+        Return license files found in repository root, None if the ref doesn't
+        exist in the repository.
+        """
+
+        owner, name = URL(str(project_url)).path.strip("/").split("/")[:2]
+        key = (owner, name, version)
+        batch = None
+        with self.lock:
+            if key not in self.futures:
+                self.futures[key] = Future()
+                self.pending.append(key)
+                if len(self.pending) >= self.batch_size:
+                    batch = self._take_pending()
+                elif self.timer is None:
+                    self.timer = threading.Timer(self.LINGER, self.flush)
+                    self.timer.daemon = True
+                    self.timer.start()
+            future = self.futures[key]
+        if batch:
+            self._resolve(batch)
+        return future.result()
+
+    def flush(self) -> None:
+        with self.lock:
+            batch = self._take_pending()
+        self._resolve(batch)
+
+    def _take_pending(self) -> list[RepositoryRef]:
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.pending = self.pending, []
+        return batch
+
+    def _resolve(self, batch: list[RepositoryRef]) -> None:
         try:
-            license_files = self._fetch_license_files(project_url, version)
-        except HTTPStatusError:
-            raise exceptions.NoLicenseFound(
-                "Could not fetch license files", name=None, version=version
+            results = self.fetch_licenses(batch)
+        except Exception as e:
+            # failures aren't cached, next lookup of the same ref retries
+            with self.lock:
+                futures = [self.futures.pop(key) for key in batch]
+            for future in futures:
+                future.set_exception(e)
+            return
+        for key, licenses in zip(batch, results):
+            self.futures[key].set_result(licenses)
+
+    def fetch_licenses(
+        self, refs: list[RepositoryRef]
+    ) -> list[Optional[list[models.License]]]:
+        trees = self._query(
+            [(owner, name, f"{ref}:") for owner, name, ref in refs],
+            self.TREE_FRAGMENT,
+        )
+        wanted: list[tuple[int, str]] = []
+        blob_expressions: list[RepositoryRef] = []
+        for idx, ((owner, name, ref), tree) in enumerate(zip(refs, trees)):
+            for entry in tree["entries"] if tree else []:
+                if entry["type"] == "blob" and "license" in entry["name"].lower():
+                    wanted.append((idx, entry["name"]))
+                    blob_expressions.append((owner, name, f"{ref}:{entry['name']}"))
+        blobs = self._query(blob_expressions, self.BLOB_FRAGMENT)
+
+        results: list[Optional[list[models.License]]] = [
+            [] if tree else None for tree in trees
+        ]
+        for (idx, filename), blob in zip(wanted, blobs):
+            licenses = results[idx]
+            if licenses is None or not blob or blob["isBinary"]:
+                continue
+            owner, name, ref = refs[idx]
+            licenses.append(
+                models.License(
+                    filename,
+                    str(blob["text"]),
+                    URL(
+                        f"https://raw.githubusercontent.com/{owner}/{name}/"
+                        f"{ref}/{filename}"
+                    ),
+                    str(blob["oid"]),
+                )
             )
+        return results
+
+    def _query(
+        self, expressions: list[RepositoryRef], fragment: str
+    ) -> list[Optional[dict[str, Any]]]:
+        results: list[Optional[dict[str, Any]]] = []
+        position = 0
+        while position < len(expressions):
+            batch = expressions[position : position + self.batch_size]
+            try:
+                results.extend(self._post(batch, fragment))
+            except exceptions.QueryTooExpensive:
+                if len(batch) == 1:
+                    raise
+                self.batch_size = len(batch) // 2
+                continue
+            position += len(batch)
+        return results
+
+    def _post(
+        self, expressions: list[RepositoryRef], fragment: str
+    ) -> list[Optional[dict[str, Any]]]:
+        response = scheduler.post(
+            self.url,
+            json={"query": self._build_query(expressions, fragment)},
+            headers={"Authorization": f"bearer {self.token}"},
+        )
+        if response.status_code in (502, 504):
+            # GitHub times out on queries that take too long to resolve
+            raise exceptions.QueryTooExpensive(response.text)
+        response.raise_for_status()
+        content = response.json()
+        errors = content.get("errors") or []
+        if any(error.get("type") in self.COST_ERROR_TYPES for error in errors):
+            raise exceptions.QueryTooExpensive(errors[0].get("message", ""))
+        data = content.get("data") or {}
+        return [
+            (data.get(f"r{idx}") or {}).get("object") for idx in range(len(expressions))
+        ]
+
+    @staticmethod
+    def _build_query(expressions: list[RepositoryRef], fragment: str) -> str:
+        # JSON string literals are valid GraphQL string literals
+        aliases = " ".join(
+            f"r{idx}: repository(owner: {json.dumps(owner)}, name: {json.dumps(name)}) "
+            f"{{ object(expression: {json.dumps(expression)}) {{ {fragment} }} }}"
+            for idx, (owner, name, expression) in enumerate(expressions)
+        )
+        return f"query {{ {aliases} }}"
+
+
+def _get(url: str, priority: Priority, **kwargs: Any) -> Optional[Response]:
+    """
+    GET that returns None instead of raising when the server can't be reached
+    """
+
+    try:
+        return scheduler.get(url, priority=priority, **kwargs)
+    except httpx.HTTPError:
+        return None
+
+
+class GithubClient:
+    def __init__(self, graphql: Optional[GithubGraphQLClient] = None) -> None:
+        self.graphql = graphql
+        # requests sent with the token share its higher rate limit
+        self.options: dict[str, Any] = (
+            {"headers": {"Authorization": f"bearer {graphql.token}"}}
+            if graphql is not None
+            else {}
+        )
+        # license contents by sha and tag indexes by repository, many versions
+        # of a project share them and may be resolved concurrently
+        self.lock = threading.Lock()
+        self.blobs: dict[str, Future[Optional[str]]] = {}
+        self.tags: dict[str, Future[Optional[tuple[str, ...]]]] = {}
+
+    def _cached(
+        self,
+        cache: dict[str, Future[Optional[T]]],
+        key: str,
+        fetch: Callable[[], Optional[T]],
+    ) -> Optional[T]:
+        """
+        Fetch the value once per key, concurrent lookups wait for the first one
+        instead of fetching it again. Failures (None) are not cached.
+        """
+
+        with self.lock:
+            future = cache.get(key)
+            owner = future is None
+            if future is None:
+                future = cache[key] = Future()
+        if not owner:
+            return future.result()
+        try:
+            result = fetch()
+        except BaseException as e:
+            with self.lock:
+                del cache[key]
+            future.set_exception(e)
+            raise
+        if result is None:
+            with self.lock:
+                del cache[key]
+        future.set_result(result)
+        return result
+
+    def get_licenses(
+        self, project_url: URLTypes, version: str, resolution: models.Resolution
+    ) -> list[models.License]:
+        """
+        Return license files that could be downloaded, problems are recorded
+        in the resolution.
+        """
+
+        if self.graphql is not None:
+            try:
+                licenses = self.graphql.get_licenses(project_url, version)
+            except (httpx.HTTPError, exceptions.QueryTooExpensive):
+                licenses = None
+            # ref not found - let REST API look for a tag resembling the version
+            if licenses is not None:
+                resolution.succeeded(models.Stage.REPOSITORY)
+                if not licenses:
+                    resolution.failed(
+                        models.Stage.DOWNLOAD, "No licenses found in repo"
+                    )
+                return licenses
+
+        license_files = self._fetch_license_files(project_url, version, resolution)
+        if license_files is None:
+            return []
+        if not license_files:
+            resolution.failed(models.Stage.DOWNLOAD, "No licenses found in repo")
+            return []
 
         results = []
         for license_file in license_files:
             download_url = license_file["download_url"]
-            raw_content = self._fetch_license_content(download_url)
+            sha = str(license_file["sha"])
+            content = self._cached(
+                self.blobs, sha, lambda: self._fetch_license_content(download_url)
+            )
+            if content is None:
+                # keep the files that could be downloaded
+                resolution.failed(
+                    models.Stage.DOWNLOAD,
+                    f"Could not download {license_file['name']}",
+                )
+                continue
             results.append(
                 models.License(
                     str(license_file["name"]),
-                    str(raw_content),
+                    content,
                     URL(download_url),
-                    str(license_file["sha"]),
+                    sha,
                 )
             )
-        if not results:
-            raise exceptions.NoLicenseFound(
-                "No licenses found in repo", name=None, version=version
+        if results:
+            resolution.succeeded(
+                models.Stage.DOWNLOAD,
+                f"{len(results)} of {len(license_files)} license files downloaded",
             )
         return results
 
     @staticmethod
-    def _fetch_license_content(url: URLTypes) -> str:
-        response = httpx.get(url)
-        response.raise_for_status()
+    def _fetch_license_content(url: URLTypes) -> Optional[str]:
+        response = _get(str(url), Priority.DOWNLOAD)
+        if response is None or response.is_error:
+            return None
         return response.text
 
-    @staticmethod
     def _fetch_license_files(
-        project_url: URLTypes, version: str, _failed: bool = False
-    ) -> list[dict[str, Union[str, URL]]]:
+        self, project_url: URLTypes, version: str, resolution: models.Resolution
+    ) -> Optional[list[dict[str, Union[str, URL]]]]:
         url = str(project_url).replace("github.com", "api.github.com/repos")
-        response = httpx.get(url + f"contents?ref={version}")
-        try:
-            response.raise_for_status()
-        except HTTPStatusError as e:
-            if response.status_code != 404 or _failed:
-                raise e
+        response = _get(url + f"contents?ref={version}", Priority.API, **self.options)
+        if response is not None and response.status_code == 404:
             # Versioning might follow different naming than tags - try to fetch tags in
             # hope of finding something that would resemble version - blame django-guardian
             # TODO: add workaround for psycopg2 which uses 2_9_3 for version 2.9.3...
-            res = httpx.get(url + "tags")
-            res.raise_for_status()
-            for tag_object in res.json():
-                if version in tag_object["name"]:
-                    return GithubClient._fetch_license_files(
-                        project_url, tag_object["name"], _failed=True
-                    )
-        licenses = [
-            file for file in response.json() if "license" in file["name"].lower()
-        ]
+            try:
+                tags = self._cached(self.tags, url, lambda: self._fetch_tags(url))
+            except httpx.HTTPStatusError as e:
+                reason = str(e.response.status_code)
+            except exceptions.BudgetExhausted as e:
+                reason = str(e)
+            except httpx.HTTPError:
+                reason = "unreachable"
+            except (ValueError, KeyError, TypeError):
+                reason = "malformed response"
+            else:
+                reason = ""
+            if reason:
+                resolution.failed(
+                    models.Stage.TAG,
+                    f"Could not fetch tags of {project_url} ({reason})",
+                )
+                return None
+            tag = next((x for x in tags or () if version in x), None)
+            if tag is None:
+                resolution.failed(models.Stage.TAG, f"No tag resembling {version}")
+                return None
+            resolution.succeeded(models.Stage.TAG, tag)
+            response = _get(url + f"contents?ref={tag}", Priority.API, **self.options)
+        if response is None or response.is_error:
+            resolution.failed(
+                models.Stage.REPOSITORY,
+                f"Could not list files of {project_url} "
+                f"({response.status_code if response is not None else 'unreachable'})",
+            )
+            return None
+        try:
+            licenses = [
+                file for file in response.json() if "license" in file["name"].lower()
+            ]
+        except (ValueError, KeyError, TypeError, AttributeError):
+            resolution.failed(
+                models.Stage.REPOSITORY, f"Malformed file listing of {project_url}"
+            )
+            return None
+        resolution.succeeded(models.Stage.REPOSITORY)
         return licenses
 
+    def _fetch_tags(self, url: str) -> tuple[str, ...]:
+        """
+        Return tag names of the repository, raises instead of returning an
+        empty index so failures aren't cached.
+        """
+
+        response = scheduler.get(
+            url + "tags", priority=Priority.FALLBACK, **self.options
+        )
+        response.raise_for_status()
+        return tuple(str(tag_object["name"]) for tag_object in response.json())
+
     def get_versioned_project_url(self, project_url: URLTypes, version: str) -> URL:
         return URL(str(project_url) + f"tree/{version}")
 
 
+class ZipMember(NamedTuple):
+    filename: str
+    method: int
+    compressed_size: int
+    header_offset: int
+    header_size: int
+
+
+class WheelClient:
+    """
+    Extracts license files straight from distributions published on PyPI.
+
+    Only the end of central directory record, the central directory and the
+    selected members are downloaded with HTTP Range requests, so a few KB are
+    transferred per package instead of the whole archive.
+    """
+
+    TAIL_SIZE: Final[int] = 8192
+    # local headers may carry a different extra field than the central directory
+    # so fetch a bit more to avoid a second round trip for the member
+    LOCAL_HEADER_SLACK: Final[int] = 256
+    EOCD_SIGNATURE: Final[bytes] = b"PK\x05\x06"
+    EOCD_FORMAT: Final[str] = "<4s4H2IH"
+    CD_SIGNATURE: Final[bytes] = b"PK\x01\x02"
+    CD_FORMAT: Final[str] = "<4s6H3I5H2I"
+    LOCAL_SIGNATURE: Final[bytes] = b"PK\x03\x04"
+    LOCAL_FORMAT: Final[str] = "<4s5H3I2H"
+    WHEEL_LICENSE_PATTERN: Final[re.Pattern[str]] = re.compile(
+        r"^[^/]+\.dist-info/(licenses/.+|(licen[cs]e|copying|notice)[^/]*)$",
+        re.IGNORECASE,
+    )
+    SDIST_LICENSE_PATTERN: Final[re.Pattern[str]] = re.compile(
+        r"^[^/]+/(licenses/.+|(licen[cs]e|copying|notice)[^/]*)$", re.IGNORECASE
+    )
+
+    def get_licenses(
+        self, urls: list[dict[str, Any]], resolution: models.Resolution
+    ) -> list[models.License]:
+        """
+        Return license files that could be extracted, members that couldn't be
+        are recorded in the resolution.
+        """
+
+        url = self._select_url(urls)
+        if url is None:
+            return []
+        try:
+            return self._extract_licenses(url, resolution)
+        except (
+            httpx.HTTPError,
+            zipfile.BadZipFile,
+            zlib.error,
+            struct.error,
+            UnicodeDecodeError,
+        ):
+            # archive can't be read at all, GitHub will be used as a fallback
+            return []
+
+    @staticmethod
+    def _select_url(urls: list[dict[str, Any]]) -> Optional[str]:
+        # wheels are preferred, zipped sdists are the only other seekable format
+        for packagetype in ("bdist_wheel", "sdist"):
+            for url_info in urls:
+                if url_info.get("packagetype") == packagetype and str(
+                    url_info.get("url", "")
+                ).endswith((".whl", ".zip")):
+                    return str(url_info["url"])
+        return None
+
+    def _extract_licenses(
+        self, url: str, resolution: models.Resolution
+    ) -> list[models.License]:
+        response = self._fetch_range(url, f"-{self.TAIL_SIZE}")
+        if response.status_code != 206:
+            return self._extract_from_archive(url, response.content, resolution)
+
+        tail = response.content
+        total_size = self._get_total_size(response)
+        tail_offset = total_size - len(tail)
+        cd_offset, cd_size = self._parse_eocd(tail)
+        if cd_offset >= tail_offset:
+            central_directory = tail[
+                cd_offset - tail_offset : cd_offset - tail_offset + cd_size
+            ]
+        else:
+            central_directory = self._fetch_range(
+                url, f"{cd_offset}-{cd_offset + cd_size - 1}"
+            ).content
+
+        results = []
+        for member in self._parse_central_directory(
+            central_directory, self._get_pattern(url)
+        ):
+            try:
+                content = self._fetch_member(url, member)
+            except (httpx.HTTPError, zipfile.BadZipFile, zlib.error, struct.error):
+                # keep the members that could be extracted
+                resolution.failed(
+                    models.Stage.DOWNLOAD, f"Could not extract {member.filename}"
+                )
+                continue
+            results.append(self._build_license(url, member.filename, content))
+        return results
+
+    @staticmethod
+    def _fetch_range(url: str, byte_range: str) -> Response:
+        response = scheduler.get(
+            url,
+            priority=Priority.DOWNLOAD,
+            headers={"Range": f"bytes={byte_range}"},
+            follow_redirects=True,
+        )
+        response.raise_for_status()
+        return response
+
+    @staticmethod
+    def _get_total_size(response: Response) -> int:
+        # Content-Range: bytes 1000-1999/2000, total may be unknown (*)
+        match = re.fullmatch(
+            r"bytes \d+-\d+/(\d+)", response.headers.get("Content-Range", "").strip()
+        )
+        if match is None:
+            raise zipfile.BadZipFile("Size of the archive is unknown")
+        return int(match.group(1))
+
+    @classmethod
+    def _get_pattern(cls, url: str) -> re.Pattern[str]:
+        if url.endswith(".whl"):
+            return cls.WHEEL_LICENSE_PATTERN
+        return cls.SDIST_LICENSE_PATTERN
+
+    @classmethod
+    def _parse_eocd(cls, tail: bytes) -> tuple[int, int]:
+        position = tail.rfind(cls.EOCD_SIGNATURE)
+        if position == -1:
+            raise zipfile.BadZipFile("End of central directory not found")
+        eocd = struct.unpack_from(cls.EOCD_FORMAT, tail, position)
+        cd_size, cd_offset = eocd[5], eocd[6]
+        if 0xFFFFFFFF in (cd_size, cd_offset):
+            raise zipfile.BadZipFile("Zip64 archives are not supported")
+        return cd_offset, cd_size
+
+    @classmethod
+    def _parse_central_directory(
+        cls, central_directory: bytes, pattern: re.Pattern[str]
+    ) -> list[ZipMember]:
+        members = []
+        position = 0
+        header_size = struct.calcsize(cls.CD_FORMAT)
+        while central_directory.startswith(cls.CD_SIGNATURE, position):
+            header = struct.unpack_from(cls.CD_FORMAT, central_directory, position)
+            flags, method, compressed_size = header[3], header[4], header[8]
+            name_len, extra_len, comment_len = header[10], header[11], header[12]
+            header_offset = header[16]
+            name_start = position + header_size
+            # names are UTF-8 only when flagged so, the same way zipfile reads them
+            filename = central_directory[name_start : name_start + name_len].decode(
+                "utf-8" if flags & 0x800 else "cp437"
+            )
+            if pattern.match(filename):
+                members.append(
+                    ZipMember(
+                        filename,
+                        method,
+                        compressed_size,
+                        header_offset,
+                        struct.calcsize(cls.LOCAL_FORMAT) + name_len + extra_len,
+                    )
+                )
+            position = name_start + name_len + extra_len + comment_len
+        return members
+
+    def _fetch_member(self, url: str, member: ZipMember) -> bytes:
+        end = (
+            member.header_offset
+            + member.header_size
+            + member.compressed_size
+            + self.LOCAL_HEADER_SLACK
+        )
+        chunk = self._fetch_range(url, f"{member.header_offset}-{end - 1}").content
+        header = struct.unpack_from(self.LOCAL_FORMAT, chunk)
+        if header[0] != self.LOCAL_SIGNATURE:
+            raise zipfile.BadZipFile(f"Bad local header for {member.filename}")
+        data_start = struct.calcsize(self.LOCAL_FORMAT) + header[9] + header[10]
+        data_end = data_start + member.compressed_size
+        if data_end > len(chunk):
+            chunk += self._fetch_range(
+                url,
+                f"{member.header_offset + len(chunk)}-"
+                f"{member.header_offset + data_end - 1}",
+            ).content
+        return self._decompress(member.method, chunk[data_start:data_end])
+
+    @staticmethod
+    def _decompress(method: int, data: bytes) -> bytes:
+        if method == zipfile.ZIP_STORED:
+            return data
+        if method == zipfile.ZIP_DEFLATED:
+            return zlib.decompress(data, -zlib.MAX_WBITS)
+        raise zipfile.BadZipFile(f"Unsupported compression method {method}")
+
+    def _extract_from_archive(
+        self, url: str, content: bytes, resolution: models.Resolution
+    ) -> list[models.License]:
+        # server ignored the Range header and sent the whole file
+        pattern = self._get_pattern(url)
+        results = []
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            for filename in archive.namelist():
+                if not pattern.match(filename):
+                    continue
+                try:
+                    data = archive.read(filename)
+                except (zipfile.BadZipFile, zlib.error, NotImplementedError):
+                    resolution.failed(
+                        models.Stage.DOWNLOAD, f"Could not extract {filename}"
+                    )
+                    continue
+                results.append(self._build_license(url, filename, data))
+        return results
+
+    @staticmethod
+    def _build_license(url: str, filename: str, content: bytes) -> models.License:
+        # use git blob sha so it's comparable with the one returned by GitHub
+        sha = hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+        return models.License(
+            filename.rsplit("/", 1)[-1],
+            content.decode("utf-8", errors="replace"),
+            URL(url).copy_with(fragment=filename),
+            sha,
+        )
+
+
 class PypiClient:
     HOST: str = "https://pypi.org/pypi/"
     VALID_PROJECT_URL_KEYS: Final[list[str]] = ["Source", "Homepage"]
 
+    def __init__(
+        self, host: Optional[str] = None, github: Optional[GithubClient] = None
+    ) -> None:
+        # allows using mirrors exposing the same JSON API (devpi, Artifactory...)
+        self.host = (host or self.HOST).rstrip("/") + "/"
+        self.github = github or GithubClient()
+
     def fetch_dependency_data(
         self, name: str, version: Optional[str] = None
-    ) -> models.Dependency:
-        url = self._build_url(name, version)
-        response = self._call(url)
-        content = response.json()["info"]
-        if version:
-            assert version == content["version"]
+    ) -> models.Resolution:
+        resolution = models.Resolution(name, version)
+        data = self._fetch_metadata(self._build_url(name, version), resolution)
+        if data is None:
+            return resolution
+        content = data["info"]
+        if version and version != content["version"]:
+            resolution.failed(
+                models.Stage.METADATA,
+                f"PyPI returned version {content['version']} instead of {version}",
+            )
+            return resolution
+        resolution.succeeded(models.Stage.METADATA)
+        resolution.version = content["version"]
+
+        resolution.dependency = self.build_dependency(
+            name, content, content["version"], data.get("urls", []), resolution
+        )
+        return resolution
+
+    def fetch_releases(
+        self, name: str, specifier: SpecifierSet, resolution: models.Resolution
+    ) -> Optional[list[str]]:
+        """
+        Return versions of all releases matching the specifier, sorted from
+        the oldest one. Yanked releases are skipped.
+        """
+
+        data = self._fetch_metadata(self._build_url(name), resolution)
+        if data is None:
+            return None
+        resolution.succeeded(models.Stage.METADATA)
+        releases = {
+            version: files
+            for version, files in data.get("releases", {}).items()
+            if files and not all(file.get("yanked") for file in files)
+        }
+        return sorted(specifier.filter(releases), key=models.version_key)
+
+    def build_dependency(
+        self,
+        name: str,
+        info: dict[str, Any],
+        version: str,
+        urls: list[dict[str, Any]],
+        resolution: models.Resolution,
+    ) -> Optional[models.Dependency]:
+        project_url = self._get_project_url(info.get("project_urls") or {})
+        # problems with the distribution only matter if its licenses are used
+        wheel_resolution = models.Resolution(name, version)
+        licenses = WheelClient().get_licenses(urls, wheel_resolution)
+        if licenses:
+            resolution.stages.extend(wheel_resolution.stages)
+            resolution.succeeded(
+                models.Stage.DOWNLOAD, "License files found in the distribution"
+            )
+        elif project_url is None:
+            resolution.failed(models.Stage.REPOSITORY, "Could not find project url")
+            return None
+        else:
+            licenses = self.github.get_licenses(project_url, version, resolution)
+            if not licenses:
+                return None
 
-        project_url = self._get_project_url(content["project_urls"])
         return models.Dependency(
             name=name,
-            version=content["version"],
-            summary=content["summary"],
-            project_url=GithubClient().get_versioned_project_url(
-                project_url, content["version"]
+            version=version,
+            summary=info.get("summary") or "",
+            project_url=(
+                self.github.get_versioned_project_url(project_url, version)
+                if project_url
+                else URL(str(info.get("project_url") or ""))
             ),
-            license_name=content["license"],
-            licenses=GithubClient().get_licenses(project_url, content["version"]),
+            license_name=info.get("license") or "",
+            licenses=licenses,
         )
 
-    @classmethod
-    def _build_url(cls, name: str, version: Optional[str] = None) -> str:
+    def _fetch_metadata(
+        self, url: str, resolution: models.Resolution
+    ) -> Optional[dict[str, Any]]:
+        response = self._call(url)
+        if response is None or response.is_error:
+            resolution.failed(
+                models.Stage.METADATA,
+                f"Could not fetch {url} "
+                f"({response.status_code if response is not None else 'unreachable'})",
+            )
+            return None
+        try:
+            data: dict[str, Any] = response.json()
+            # fail here rather than somewhere down the line
+            data["info"]["version"]
+        except (ValueError, KeyError, TypeError):
+            resolution.failed(models.Stage.METADATA, f"Malformed response from {url}")
+            return None
+        return data
+
+    def _build_url(self, name: str, version: Optional[str] = None) -> str:
         if version:
-            return cls.HOST + f"{name}/{version}/json"
-        return cls.HOST + f"{name}/json"
+            return self.host + f"{name}/{version}/json"
+        return self.host + f"{name}/json"
 
     @staticmethod
-    def _call(url: str) -> Response:
-        response: Response = httpx.get(url)
-        response.raise_for_status()
-        return response
+    def _call(url: str) -> Optional[Response]:
+        return _get(url, Priority.METADATA)
 
     @classmethod
-    def _get_project_url(cls, project_urls: dict[str, URLTypes]) -> URL:
+    def _get_project_url(cls, project_urls: dict[str, URLTypes]) -> Optional[URL]:
         pattern = r"(?P<url>http[s]?://github\.com/[-_\w]+/[-_\w]+).*"
         # TODO: add test for django-filter
         for url in project_urls.values():
             if url and (m := re.match(pattern, str(url))):
                 return URL(m.groupdict()["url"] + "/")
-        raise Exception("Could not find project url")
+        return None
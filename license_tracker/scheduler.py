@@ -0,0 +1,244 @@
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Final, Iterator, Optional
+
+import httpx
+from httpx import URL, Response
+
+from license_tracker import exceptions
+
+
+class Priority(IntEnum):
+    """
+    Lower value goes first when requests to the same host are queued
+    """
+
+    METADATA = 0
+    DOWNLOAD = 1
+    API = 2
+    FALLBACK = 3
+
+
+@dataclass
+class HostLimit:
+    concurrency: int
+    # requests per second and maximum number of requests that can be made at once
+    rate: float
+    burst: int
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        # server reported budget doesn't refill gradually, all of it comes back
+        # at once when its window resets
+        self.held_until = 0.0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        if self.held_until:
+            if now < self.held_until:
+                self.updated_at = now
+                return
+            self.held_until = 0.0
+            self.tokens = float(self.capacity)
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+
+    def reserve(self, keep: float = 0.0) -> float:
+        """
+        Take a token if available without going below keep tokens, otherwise
+        return number of seconds to wait
+        """
+
+        self._refill()
+        if self.tokens - keep >= 1:
+            self.tokens -= 1
+            return 0.0
+        if self.held_until:
+            return self.held_until - self.updated_at
+        return (1 + keep - self.tokens) / self.rate
+
+    def limit(self, remaining: int, reset_in: Optional[float] = None) -> None:
+        # server knows better how much of the budget is left (other clients,
+        # previous runs) so never assume more than it reports until it resets
+        self._refill()
+        self.tokens = min(self.tokens, float(remaining))
+        if reset_in is not None and reset_in > 0:
+            self.held_until = self.updated_at + reset_in
+
+    @property
+    def available(self) -> float:
+        self._refill()
+        return self.tokens
+
+
+@dataclass
+class HostQueue:
+    limit: HostLimit
+    bucket: TokenBucket
+    active: int = 0
+    waiters: list[tuple[int, int]] = field(default_factory=list)
+
+
+class Scheduler:
+    """
+    Throttles HTTP requests per host.
+
+    Each host has its own concurrency cap and token bucket, queued requests are
+    served by priority so cheap lookups aren't starved by expensive fallbacks.
+    Fallbacks can't spend the part of the budget reserved for other requests,
+    otherwise they could drain it while nothing else is queued. Requests that
+    would wait longer than max_wait seconds fail instead.
+    """
+
+    FALLBACK_RESERVE: Final[float] = 0.5
+    MAX_WAIT: Final[float] = 120.0
+
+    DEFAULT_LIMIT: Final[HostLimit] = HostLimit(concurrency=4, rate=10, burst=10)
+    LIMITS: Final[dict[str, HostLimit]] = {
+        "pypi.org": HostLimit(concurrency=10, rate=50, burst=50),
+        "files.pythonhosted.org": HostLimit(concurrency=10, rate=50, burst=50),
+        "raw.githubusercontent.com": HostLimit(concurrency=6, rate=20, burst=20),
+        # unauthenticated GitHub API allows 60 requests per hour
+        "api.github.com": HostLimit(concurrency=2, rate=60 / 3600, burst=60),
+    }
+    AUTHENTICATED_LIMITS: Final[dict[str, HostLimit]] = {
+        # tokens get 5000 requests per hour
+        "api.github.com": HostLimit(concurrency=4, rate=5000 / 3600, burst=500),
+    }
+
+    def __init__(
+        self,
+        limits: Optional[dict[str, HostLimit]] = None,
+        max_wait: Optional[float] = None,
+    ) -> None:
+        self.limits = {**self.LIMITS, **(limits or {})}
+        self.max_wait = self.MAX_WAIT if max_wait is None else max_wait
+        self.hosts: dict[str, HostQueue] = {}
+        self.condition = threading.Condition()
+        self.counter = itertools.count()
+
+    def get(
+        self, url: str, *, priority: Priority = Priority.DOWNLOAD, **kwargs: Any
+    ) -> Response:
+        host = URL(url).host
+        with self.slot(host, priority):
+            response: Response = httpx.get(url, **kwargs)
+        self._update_budget(host, response)
+        return response
+
+    def post(
+        self, url: str, *, priority: Priority = Priority.API, **kwargs: Any
+    ) -> Response:
+        host = URL(url).host
+        with self.slot(host, priority):
+            response: Response = httpx.post(url, **kwargs)
+        self._update_budget(host, response)
+        return response
+
+    def authenticate(self, host: str) -> None:
+        """
+        Switch host to the limits of authenticated requests, server reported
+        budget still applies.
+        """
+
+        self.set_limit(host, self.AUTHENTICATED_LIMITS[host])
+
+    def set_limit(self, host: str, limit: HostLimit) -> None:
+        with self.condition:
+            self.limits[host] = limit
+            if host in self.hosts:
+                self.hosts[host].limit = limit
+                self.hosts[host].bucket = TokenBucket(limit.rate, limit.burst)
+            self.condition.notify_all()
+
+    @contextmanager
+    def slot(self, host: str, priority: Priority) -> Iterator[None]:
+        self._acquire(host, priority)
+        try:
+            yield
+        finally:
+            self._release(host)
+
+    def _get_queue(self, host: str) -> HostQueue:
+        if host not in self.hosts:
+            limit = self.limits.get(host, self.DEFAULT_LIMIT)
+            self.hosts[host] = HostQueue(limit, TokenBucket(limit.rate, limit.burst))
+        return self.hosts[host]
+
+    def _acquire(self, host: str, priority: Priority) -> None:
+        deadline = time.monotonic() + self.max_wait
+        with self.condition:
+            queue = self._get_queue(host)
+            entry = (int(priority), next(self.counter))
+            heapq.heappush(queue.waiters, entry)
+            while True:
+                remaining = deadline - time.monotonic()
+                if queue.waiters[0] == entry and queue.active < queue.limit.concurrency:
+                    keep = (
+                        queue.limit.burst * self.FALLBACK_RESERVE
+                        if priority == Priority.FALLBACK
+                        else 0.0
+                    )
+                    wait_for = queue.bucket.reserve(keep)
+                    if not wait_for:
+                        heapq.heappop(queue.waiters)
+                        queue.active += 1
+                        self.condition.notify_all()
+                        return
+                    if wait_for > remaining:
+                        # no point in waiting when the budget won't come back in time
+                        self._give_up(queue, entry)
+                        raise exceptions.BudgetExhausted(
+                            f"{host} budget is exhausted for {wait_for:.0f}s"
+                        )
+                    self.condition.wait(timeout=wait_for)
+                elif remaining <= 0:
+                    self._give_up(queue, entry)
+                    raise exceptions.BudgetExhausted(
+                        f"Waited for {host} longer than {self.max_wait:.0f}s"
+                    )
+                else:
+                    self.condition.wait(timeout=remaining)
+
+    def _give_up(self, queue: HostQueue, entry: tuple[int, int]) -> None:
+        queue.waiters.remove(entry)
+        heapq.heapify(queue.waiters)
+        self.condition.notify_all()
+
+    def _release(self, host: str) -> None:
+        with self.condition:
+            self.hosts[host].active -= 1
+            self.condition.notify_all()
+
+    def _update_budget(self, host: str, response: Response) -> None:
+        remaining = response.headers.get("x-ratelimit-remaining")
+        if remaining is None or not remaining.isdigit():
+            return
+        # epoch seconds at which the server restores the budget
+        reset = response.headers.get("x-ratelimit-reset", "")
+        reset_in = int(reset) - time.time() if reset.isdigit() else None
+        with self.condition:
+            self.hosts[host].bucket.limit(int(remaining), reset_in)
+
+    def describe(self) -> str:
+        with self.condition:
+            return " | ".join(
+                f"{host}: {len(queue.waiters)} queued, {queue.active} active, "
+                f"{int(queue.bucket.available)} budget"
+                for host, queue in self.hosts.items()
+            )
+
+
+scheduler = Scheduler()
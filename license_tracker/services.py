@@ -1,27 +1,193 @@
-from typing import Optional
+import dataclasses
+from concurrent.futures import ThreadPoolExecutor
+from typing import Final, Optional, Union
 
 import rich
+from packaging.specifiers import SpecifierSet
 
-from license_tracker import exceptions, models, providers
+from license_tracker import models, providers
+from license_tracker.database import LicenseDatabase
 
 
 class DependencyAnalyzer:
-    def __init__(self, name: str, version: Optional[str]):
+    def __init__(
+        self,
+        name: str,
+        version: Optional[str],
+        *,
+        index_url: Optional[str] = None,
+        database: Optional[LicenseDatabase] = None,
+        offline: bool = False,
+        graphql: Optional[providers.GithubGraphQLClient] = None,
+    ):
         self.name = name
         self.version = version
+        self.index_url = index_url
+        self.database = database
+        self.offline = offline
+        self.graphql = graphql
 
-    def __call__(self) -> Optional[models.Dependency]:
-        try:
-            dependency = providers.PypiClient().fetch_dependency_data(
-                self.name, self.version
-            )
-        except exceptions.NoLicenseFound as e:
-            rich.print(
-                f"{self.name} ({e.dependency_version}) [red]:heavy_exclamation_mark: No licenses found"
-            )
-            return None
+    def __call__(self) -> models.Resolution:
+        # without a version only PyPI knows which release is the latest one,
+        # the most recently stored one is good enough for offline hosts
+        if (
+            self.database is not None
+            and (self.version or self.offline)
+            and (dependency := self.database.get(self.name, self.version))
+        ):
+            rich.print(f"{dependency} [green]:heavy_check_mark: (from database)")
+            return models.Resolution(self.name, dependency.version, dependency)
+        if self.offline:
+            resolution = models.Resolution(self.name, self.version)
+            resolution.failed(models.Stage.METADATA, "Not found in database")
+            print_resolution(resolution)
+            return resolution
+
+        client = providers.PypiClient(
+            self.index_url, providers.GithubClient(self.graphql)
+        )
+        resolution = client.fetch_dependency_data(self.name, self.version)
+        print_resolution(resolution)
+        # partial results are exported, but not cached
+        if (
+            self.database is not None
+            and resolution.dependency
+            and not resolution.errors
+        ):
+            self.database.add(resolution.dependency)
+
+        return resolution
+
+
+def analyze(
+    analyzer: Union[DependencyAnalyzer, "RangeAnalyzer"]
+) -> list[models.Resolution]:
+    """
+    Run the analyzer, errors it didn't anticipate are recorded in a failed
+    resolution so they don't stop other dependencies from being checked.
+    """
+
+    try:
+        result = analyzer()
+    except Exception as e:
+        resolution = models.Resolution(
+            analyzer.name,
+            analyzer.version
+            if isinstance(analyzer, DependencyAnalyzer)
+            else str(analyzer.specifier),
+        )
+        resolution.failed(models.Stage.UNEXPECTED, f"{type(e).__name__}: {e}")
+        print_resolution(resolution)
+        return [resolution]
+    return result if isinstance(result, list) else [result]
+
+
+def print_resolution(resolution: models.Resolution) -> None:
+    dependency = resolution.dependency
+    if dependency is None:
+        rich.print(
+            f"{resolution} [red]:heavy_exclamation_mark: {resolution.errors[-1].message}"
+        )
+    elif resolution.partial:
+        rich.print(
+            f"{dependency} [yellow]:heavy_check_mark: Some license files are missing"
+        )
+    else:
         rich.print(
             f"{dependency} [green]:heavy_check_mark:{ ' [/green][yellow]Found multiple license files' if len(dependency.licenses) > 1 else ''}"
         )
 
-        return dependency
+
+class RangeAnalyzer:
+    """
+    Resolves every release matching the specifier and returns only the ones in
+    which set of license files (compared by sha) differs from the previous one.
+
+    Project JSON is fetched once to list the releases, each of them is then
+    resolved from its own metadata, as license name and summary may differ
+    between releases. Releases are resolved concurrently but compared in order,
+    tag index and license contents are shared between them.
+    """
+
+    WORKERS: Final[int] = 8
+
+    def __init__(
+        self,
+        name: str,
+        specifier: SpecifierSet,
+        *,
+        index_url: Optional[str] = None,
+        database: Optional[LicenseDatabase] = None,
+        offline: bool = False,
+        graphql: Optional[providers.GithubGraphQLClient] = None,
+    ):
+        self.name = name
+        self.specifier = specifier
+        self.database = database
+        self.offline = offline
+        self.client = providers.PypiClient(index_url, providers.GithubClient(graphql))
+
+    def __call__(self) -> list[models.Resolution]:
+        """
+        Return resolutions of releases in which license has changed and of the
+        ones that failed
+        """
+
+        if self.offline:
+            resolved = self._resolve_from_database()
+        else:
+            resolution = models.Resolution(self.name, str(self.specifier))
+            versions = self.client.fetch_releases(self.name, self.specifier, resolution)
+            if versions is None:
+                print_resolution(resolution)
+                return [resolution]
+            with ThreadPoolExecutor(self.WORKERS) as executor:
+                resolved = list(executor.map(self._resolve, versions))
+
+        results = []
+        previous: Optional[frozenset[str]] = None
+        for resolution in resolved:
+            if resolution.dependency is None:
+                results.append(resolution)
+                continue
+            shas = frozenset(x.sha for x in resolution.dependency.licenses)
+            if shas != previous:
+                results.append(resolution)
+            elif resolution.errors:
+                # not exported, only reported
+                results.append(dataclasses.replace(resolution, dependency=None))
+            previous = shas
+        changed = [x.version for x in results if x.dependency]
+        rich.print(
+            f"{self.name} ({self.specifier}) [green]:heavy_check_mark: "
+            f"{len(resolved)} releases checked, license changed in "
+            f"{', '.join(str(x) for x in changed) or 'none'}"
+        )
+        return results
+
+    def _resolve(self, version: str) -> models.Resolution:
+        if self.database is not None and (
+            dependency := self.database.get(self.name, version)
+        ):
+            return models.Resolution(self.name, version, dependency)
+        resolution = self.client.fetch_dependency_data(self.name, version)
+        if resolution.errors:
+            print_resolution(resolution)
+        if (
+            self.database is not None
+            and resolution.dependency
+            and not resolution.errors
+        ):
+            self.database.add(resolution.dependency)
+        return resolution
+
+    def _resolve_from_database(self) -> list[models.Resolution]:
+        if self.database is None:
+            return []
+        versions = self.specifier.filter(
+            record.version for record in self.database.records(name=self.name)
+        )
+        return [
+            models.Resolution(self.name, version, self.database.get(self.name, version))
+            for version in sorted(versions, key=models.version_key)
+        ]
@@ -1,39 +1,229 @@
 import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Optional, Union
 
 import typer
-from rich.progress import track
+from rich import print
+from rich.progress import Progress, TextColumn
+from rich.table import Table
 
-from license_tracker import exporters, models, services
+from license_tracker import exporters, models, providers, services
+from license_tracker.database import LicenseDatabase
+from license_tracker.policy import Policy
+from license_tracker.scheduler import scheduler
 
 app = typer.Typer()
 
 
+def load_config() -> dict[str, Any]:
+    with open("./config.json", "r") as f:
+        config: dict[str, Any] = json.load(f)
+    return config
+
+
+def get_database_path(config: dict[str, Any], must_exist: bool = True) -> str:
+    """
+    Return path of the license database, commands working on it exit with
+    code 2 when it isn't configured (or doesn't exist yet)
+    """
+
+    path: Optional[str] = config.get("database")
+    if not path:
+        print("[red]License database is not configured, set database in config.json")
+        raise typer.Exit(code=2)
+    if must_exist and not os.path.exists(path):
+        print(f"[red]{path} does not exist")
+        raise typer.Exit(code=2)
+    return path
+
+
 @app.command()
 def check(
     dependencies: list[str],
     show: bool = typer.Option(False, help=""),
+    index_url: Optional[str] = typer.Option(
+        None, help="Base URL of PyPI JSON API, overrides config.json"
+    ),
+    offline: bool = typer.Option(
+        False, help="Resolve dependencies only from the license database"
+    ),
+    github_token: Optional[str] = typer.Option(
+        None,
+        envvar="GITHUB_TOKEN",
+        help="Fetch license files from GitHub using batched GraphQL queries",
+    ),
 ) -> None:
     """
     Check licenses of one or more packages
     """
 
-    with open("./config.json", "r") as f:
-        config = json.load(f)
-    processed_items = []
-    for item in track(dependencies, description="Processing..."):
-        name, version = models.Dependency.parse_string(item)
-        analyzer = services.DependencyAnalyzer(name, version)
-        dependency = analyzer()
-        if dependency:
-            processed_items.append(dependency)
-
-    exporters.FileExporter().single(
-        processed_items, extra_rows=config.get("extra_rows", [])
-    )
+    config = load_config()
+    if "max_wait" in config:
+        scheduler.max_wait = float(config["max_wait"])
+    database_path = config.get("database")
+    database = LicenseDatabase(database_path) if database_path else None
+    graphql = None
+    if github_token:
+        graphql = providers.GithubGraphQLClient(github_token)
+        scheduler.authenticate("api.github.com")
+    sinks: list[exporters.Exporter] = [exporters.FileExporter()]
     if show:
-        exporters.ConsoleExporter().single(
-            processed_items, extra_rows=config.get("extra_rows", [])
+        sinks.append(exporters.ConsoleExporter())
+    pipeline = exporters.ExportPipeline(sinks, extra_rows=config.get("extra_rows", []))
+    report = exporters.ErrorReport()
+
+    def resolve(
+        index: int,
+        analyzer: Union[services.DependencyAnalyzer, services.RangeAnalyzer],
+    ) -> None:
+        resolved = []
+        try:
+            for resolution in services.analyze(analyzer):
+                report.add(resolution)
+                if resolution.dependency is not None:
+                    resolved.append(resolution.dependency)
+        finally:
+            # exported in input order, blocks when exporters fall behind
+            pipeline.put(resolved, index)
+
+    progress = Progress(
+        *Progress.get_default_columns(),
+        TextColumn("{task.fields[scheduler]}"),
+        console=exporters.console,
+    )
+    with progress, pipeline, ThreadPoolExecutor(config.get("workers", 8)) as executor:
+        task = progress.add_task("Processing...", total=len(dependencies), scheduler="")
+        pending = set()
+        for index, item in enumerate(dependencies):
+            options: dict[str, Any] = dict(
+                index_url=index_url or config.get("index_url"),
+                database=database,
+                offline=offline,
+                graphql=graphql,
+            )
+            analyzer: Union[services.DependencyAnalyzer, services.RangeAnalyzer]
+            if version_range := models.Dependency.parse_range(item):
+                analyzer = services.RangeAnalyzer(*version_range, **options)
+            else:
+                analyzer = services.DependencyAnalyzer(
+                    *models.Dependency.parse_string(item), **options
+                )
+            pending.add(executor.submit(resolve, index, analyzer))
+        while pending:
+            done, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+            for future in done:
+                future.result()
+            progress.update(task, advance=len(done), scheduler=scheduler.describe())
+    if database is not None:
+        database.close()
+    report.print()
+
+
+@app.command("export-db")
+def export_db(path: str) -> None:
+    """
+    Pack license database into a single file that can be copied to offline hosts
+    """
+
+    database_path = get_database_path(load_config())
+    if os.path.abspath(path) == os.path.abspath(database_path):
+        print(f"[red]{path} is the license database itself")
+        raise typer.Exit(code=1)
+    # export is written next to the target and moved into place once complete
+    # so a failed export never leaves a truncated file behind
+    temporary_path = f"{path}.tmp"
+    if os.path.exists(temporary_path):
+        os.remove(temporary_path)
+    with LicenseDatabase(database_path) as source, LicenseDatabase(
+        temporary_path
+    ) as target:
+        count = target.merge(source)
+        target.connection.execute("VACUUM")
+    os.replace(temporary_path, path)
+    print(f"Exported {count} dependencies to {path}")
+
+
+@app.command("import-db")
+def import_db(path: str) -> None:
+    """
+    Merge dependencies from exported database into local license database
+    """
+
+    if not os.path.exists(path):
+        print(f"[red]{path} does not exist")
+        raise typer.Exit(code=1)
+    database_path = get_database_path(load_config(), must_exist=False)
+    with LicenseDatabase(path) as source, LicenseDatabase(database_path) as target:
+        count = target.merge(source)
+    print(f"Imported {count} dependencies from {path}")
+
+
+@app.command()
+def query(
+    name: Optional[str] = typer.Option(None, help="Dependency name"),
+    license_name: Optional[str] = typer.Option(
+        None, "--license", help="License name, * and ? wildcards are allowed"
+    ),
+    sha: Optional[str] = typer.Option(None, help="Sha of a license file"),
+    changed: bool = typer.Option(
+        False, help="Show versions in which license has changed"
+    ),
+) -> None:
+    """
+    Search dependencies stored in license database
+    """
+
+    with LicenseDatabase(get_database_path(load_config())) as database:
+        if changed:
+            table = Table("Name", "Previous version", "Version", "License Name")
+            for change in database.license_changes(
+                name, license_name=license_name, sha=sha
+            ):
+                table.add_row(
+                    change.current.name,
+                    change.previous.version,
+                    change.current.version,
+                    f"{change.previous.license_name} -> {change.current.license_name}",
+                )
+        else:
+            table = Table("Name", "Version", "License Name", "License sha")
+            for record in database.records(
+                name=name, license_name=license_name, sha=sha
+            ):
+                table.add_row(
+                    record.name,
+                    record.version,
+                    record.license_name,
+                    "\n".join(sorted(record.shas)),
+                )
+    print(table)
+
+
+@app.command()
+def policy() -> None:
+    """
+    Check dependencies stored in license database against policy from config.json,
+    exits with code 1 on violations and 2 when there is nothing to check
+    """
+
+    config = load_config()
+    rules = Policy.from_config(config.get("policy", {}))
+    # an empty database would pass any policy, so refuse to evaluate it
+    database_path = get_database_path(config)
+    with LicenseDatabase(database_path) as database:
+        records = database.records()
+    if not records:
+        print(f"[red]{database_path} contains no dependencies")
+        raise typer.Exit(code=2)
+    violations = rules.evaluate(records)
+    for violation in violations:
+        print(
+            f"{violation.record.name} ({violation.record.version}) [red]{violation.reason}"
         )
+    if violations:
+        raise typer.Exit(code=1)
+    print("[green]No policy violations found")
 
 
 if __name__ == "__main__":
@@ -1,6 +1,6 @@
 import pytest
 
-from license_tracker.models import Dependency, License
+from license_tracker.models import Dependency, License, Resolution
 
 
 @pytest.fixture
@@ -33,3 +33,8 @@ def dependency(package_name: str, version: str, license_: License) -> Dependency
         license_name="MIT",
         licenses=[license_],
     )
+
+
+@pytest.fixture
+def resolution(package_name: str, version: str) -> Resolution:
+    return Resolution(package_name, version)
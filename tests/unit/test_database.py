@@ -0,0 +1,122 @@
+import pytest
+
+from license_tracker.database import LicenseDatabase
+from license_tracker.models import Dependency, License
+
+
+@pytest.fixture
+def database() -> LicenseDatabase:
+    return LicenseDatabase(":memory:")
+
+
+class TestLicenseDatabase:
+    def test_get_returns_stored_dependency(
+        self, database: LicenseDatabase, dependency: Dependency
+    ) -> None:
+        database.add(dependency)
+        assert database.get(dependency.name, dependency.version) == dependency
+
+    def test_get_normalizes_names(
+        self, database: LicenseDatabase, dependency: Dependency
+    ) -> None:
+        dependency.name = "Django_Filter"
+        database.add(dependency)
+        assert database.get("django-filter", dependency.version) == dependency
+
+    def test_get_returns_none_for_unknown_version(
+        self, database: LicenseDatabase, dependency: Dependency
+    ) -> None:
+        database.add(dependency)
+        assert database.get(dependency.name, "0.0.1") is None
+
+    def test_get_without_version_returns_latest_stored(
+        self, database: LicenseDatabase, dependency: Dependency
+    ) -> None:
+        database.add(dependency)
+        dependency.version = "0.0.1"
+        database.add(dependency)
+        result = database.get(dependency.name)
+        assert result and result.version == "0.0.1"
+
+    def test_add_replaces_existing_dependency(
+        self, database: LicenseDatabase, dependency: Dependency
+    ) -> None:
+        database.add(dependency)
+        dependency.summary = "Even cooler project"
+        database.add(dependency)
+        assert len(database) == 1
+        assert database.get(dependency.name, dependency.version) == dependency
+
+    def test_license_contents_are_stored_once_per_sha(
+        self, database: LicenseDatabase, dependency: Dependency, license_: License
+    ) -> None:
+        database.add(dependency)
+        dependency.version = "0.0.1"
+        database.add(dependency)
+        (count,) = database.connection.execute("SELECT COUNT(*) FROM blobs").fetchone()
+        assert count == 1
+
+    def test_merge_copies_all_dependencies(
+        self, database: LicenseDatabase, dependency: Dependency
+    ) -> None:
+        database.add(dependency)
+        target = LicenseDatabase(":memory:")
+        assert target.merge(database) == 1
+        assert list(target) == [dependency]
+
+    def test_records_can_be_filtered(
+        self, database: LicenseDatabase, dependency: Dependency, license_: License
+    ) -> None:
+        database.add(dependency)
+        dependency.name, dependency.license_name = "other", "GPL-3.0"
+        database.add(dependency)
+
+        assert [x.name for x in database.records(license_name="mit")] == ["project"]
+        assert [x.name for x in database.records(license_name="*gpl*")] == ["other"]
+        assert [x.name for x in database.records(name="Other")] == ["other"]
+        assert len(database.records(sha=license_.sha)) == 2
+        assert not database.records(sha="unknown")
+
+    def test_records_contain_license_shas(
+        self, database: LicenseDatabase, dependency: Dependency, license_: License
+    ) -> None:
+        database.add(dependency)
+        (record,) = database.records()
+        assert record.shas == {license_.sha}
+
+    def test_license_changes_compares_consecutive_versions(
+        self, database: LicenseDatabase, dependency: Dependency, license_: License
+    ) -> None:
+        original_sha = license_.sha
+        for version in ["1.10.0", "1.2.0", "1.9.0"]:
+            dependency.version = version
+            license_.sha = "changed" if version == "1.10.0" else original_sha
+            database.add(dependency)
+
+        (change,) = database.license_changes()
+
+        assert change.previous.version == "1.9.0"
+        assert change.current.version == "1.10.0"
+
+    def test_license_changes_are_filtered_by_license_name_and_sha(
+        self, database: LicenseDatabase, dependency: Dependency, license_: License
+    ) -> None:
+        original_sha = license_.sha
+        for version, license_name, sha in [
+            ("1.0", "BSD", original_sha),
+            ("2.0", "GPL-3.0", "gpl"),
+            ("3.0", "MIT", "mit"),
+        ]:
+            dependency.version = version
+            dependency.license_name = license_name
+            license_.sha = sha
+            database.add(dependency)
+
+        assert [
+            (x.previous.version, x.current.version)
+            for x in database.license_changes(license_name="*gpl*")
+        ] == [("1.0", "2.0"), ("2.0", "3.0")]
+        assert [
+            (x.previous.version, x.current.version)
+            for x in database.license_changes(sha="mit")
+        ] == [("2.0", "3.0")]
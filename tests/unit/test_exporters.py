@@ -1,10 +1,20 @@
+import dataclasses
+import threading
 from unittest.mock import MagicMock, patch
 
 import pytest
 from rich.table import Table
 
-from license_tracker.exporters import ConsoleExporter, FileExporter, as_dict
-from license_tracker.models import Dependency
+from license_tracker import exporters
+from license_tracker.exporters import (
+    ConsoleExporter,
+    ErrorReport,
+    ExportPipeline,
+    FileExporter,
+    Rows,
+    as_dict,
+)
+from license_tracker.models import Dependency, Resolution, Stage
 
 
 class TestAsDict:
@@ -133,3 +143,122 @@ class TestFileExporter:
     ) -> None:
         actual = FileExporter()._format_line(value, " ")
         assert actual == expected_results
+
+
+class RecordingExporter:
+    def __init__(self) -> None:
+        self.exported: list[tuple[Dependency, Rows]] = []
+
+    def export(self, dependency: Dependency, rows: Rows) -> None:
+        self.exported.append((dependency, rows))
+
+
+class TestExportPipeline:
+    def test_every_exporter_receives_every_dependency(
+        self, dependency: Dependency
+    ) -> None:
+        sinks = [RecordingExporter(), RecordingExporter()]
+        with ExportPipeline(list(sinks)) as pipeline:
+            pipeline.put(dependency)
+            pipeline.put([dependency, dependency])
+            pipeline.put(None)
+
+        assert all(len(sink.exported) == 3 for sink in sinks)
+
+    @patch.object(exporters, "as_dict", wraps=as_dict)
+    def test_rows_are_computed_once_per_dependency(
+        self, mock_as_dict: MagicMock, dependency: Dependency
+    ) -> None:
+        sinks = [RecordingExporter(), RecordingExporter()]
+        with ExportPipeline(list(sinks), extra_rows=["Lorem"]) as pipeline:
+            pipeline.put(dependency)
+
+        mock_as_dict.assert_called_once_with(dependency, extra_rows=["Lorem"])
+        assert sinks[0].exported[0][1] is sinks[1].exported[0][1]
+
+    def test_put_blocks_when_exporter_falls_behind(
+        self, dependency: Dependency
+    ) -> None:
+        release = threading.Event()
+        sink = MagicMock()
+        sink.export.side_effect = lambda *args: release.wait()
+        with ExportPipeline([sink], maxsize=1) as pipeline:
+            # first one is taken by exporter, second one fills the queue
+            pipeline.put([dependency, dependency])
+            producer = threading.Thread(target=pipeline.put, args=(dependency,))
+            producer.start()
+            producer.join(timeout=0.1)
+            assert producer.is_alive()
+            release.set()
+            producer.join()
+
+        assert sink.export.call_count == 3
+
+    def test_indexed_results_are_exported_in_order(
+        self, dependency: Dependency
+    ) -> None:
+        sink = RecordingExporter()
+        versions = ["1.0", "1.1", "1.2", "1.3"]
+        results = [dataclasses.replace(dependency, version=x) for x in versions]
+        with ExportPipeline([sink]) as pipeline:
+            for index in (2, 0, 3):
+                pipeline.put(results[index], index)
+            pipeline.put(None, 1)
+
+        assert [x.version for x, _ in sink.exported] == ["1.0", "1.2", "1.3"]
+
+    def test_put_blocks_when_too_many_results_wait_for_earlier_ones(
+        self, dependency: Dependency
+    ) -> None:
+        sink = RecordingExporter()
+        with ExportPipeline([sink], maxsize=1) as pipeline:
+            pipeline.put(dependency, 1)
+            producer = threading.Thread(target=pipeline.put, args=(dependency, 2))
+            producer.start()
+            producer.join(timeout=0.1)
+            assert producer.is_alive()
+            # the next index in order is never held back
+            pipeline.put(dependency, 0)
+            producer.join()
+
+        assert len(sink.exported) == 3
+
+    def test_exporter_errors_are_raised_on_exit(self, dependency: Dependency) -> None:
+        sink = MagicMock()
+        sink.export.side_effect = OSError("disk full")
+        with pytest.raises(OSError):
+            with ExportPipeline([sink], maxsize=1) as pipeline:
+                pipeline.put([dependency] * 5)
+
+    @patch("license_tracker.exporters.console.print")
+    def test_reports_when_nothing_was_exported(self, mocked_console: MagicMock) -> None:
+        with ExportPipeline([RecordingExporter()]):
+            pass
+        mocked_console.assert_called_once_with("No dependencies to export")
+
+
+class TestErrorReport:
+    @patch("license_tracker.exporters.console.print")
+    def test_nothing_is_printed_without_errors(
+        self, mocked_console: MagicMock, resolution: Resolution
+    ) -> None:
+        report = ErrorReport()
+        report.add(resolution)
+        report.print()
+        mocked_console.assert_not_called()
+
+    @patch("license_tracker.exporters.console.print")
+    def test_a_row_is_printed_per_error(
+        self, mocked_console: MagicMock, resolution: Resolution, dependency: Dependency
+    ) -> None:
+        resolution.dependency = dependency
+        resolution.failed(Stage.DOWNLOAD, "Could not download LICENSE")
+        resolution.failed(Stage.DOWNLOAD, "Could not download COPYING")
+        report = ErrorReport()
+        report.add(resolution)
+
+        report.print()
+
+        table: Table = mocked_console.call_args[0][0]
+        assert table.row_count == 2
+        assert list(table.columns[1].cells) == ["partial", "partial"]
@@ -1,8 +1,9 @@
 from typing import Optional, Tuple
 
 import pytest
+from packaging.specifiers import SpecifierSet
 
-from license_tracker.models import Dependency
+from license_tracker.models import Dependency, version_key
 
 
 class TestDependency:
@@ -31,3 +32,34 @@ class TestDependency:
         self, value: str, expected_result: Tuple[str, Optional[str]]
     ) -> None:
         assert expected_result == Dependency.parse_string(value)
+
+    @pytest.mark.parametrize(
+        "value, expected_result",
+        (
+            ("packaging>=1.0,<2.0", ("packaging", ">=1.0,<2.0")),
+            (" packaging ~= 21.0 ", ("packaging", "~=21.0")),
+            ("packaging!=21.1", ("packaging", "!=21.1")),
+        ),
+    )
+    def test_parse_range_returns_name_and_specifier(
+        self, value: str, expected_result: Tuple[str, str]
+    ) -> None:
+        result = Dependency.parse_range(value)
+        assert result and (result[0], str(result[1])) == (
+            expected_result[0],
+            str(SpecifierSet(expected_result[1])),
+        )
+
+    @pytest.mark.parametrize("value", ["packaging", "packaging==21.3"])
+    def test_parse_range_ignores_pinned_dependencies(self, value: str) -> None:
+        assert Dependency.parse_range(value) is None
+
+
+def test_version_key_sorts_versions() -> None:
+    versions = ["1.10", "1.9", "not-a-version", "1.10rc1"]
+    assert sorted(versions, key=version_key) == [
+        "not-a-version",
+        "1.9",
+        "1.10rc1",
+        "1.10",
+    ]
@@ -0,0 +1,49 @@
+from typing import Optional
+
+import pytest
+
+from license_tracker.database import Record
+from license_tracker.policy import Policy
+
+
+def record(license_name: Optional[str], name: str = "project") -> Record:
+    return Record(name, "1.2.3", license_name, frozenset({"sha"}))
+
+
+class TestPolicy:
+    @pytest.mark.parametrize(
+        "license_name, expected_reason",
+        (
+            ("MIT", None),
+            ("GPL-3.0", "License 'GPL-3.0' is denied"),
+            ("lgpl", "License 'lgpl' is denied"),
+            ("Proprietary", "License 'Proprietary' is not allowed"),
+        ),
+    )
+    def test_check_applies_allow_and_deny_rules(
+        self, license_name: str, expected_reason: Optional[str]
+    ) -> None:
+        policy = Policy(allow=["MIT", "BSD*", "*GPL*"], deny=["*gpl*"])
+        violation = policy.check(record(license_name))
+        assert (violation and violation.reason) == expected_reason
+
+    @pytest.mark.parametrize("license_name", ["", " ", None])
+    def test_missing_license_name_is_a_violation(
+        self, license_name: Optional[str]
+    ) -> None:
+        policy = Policy(deny=["*GPL*"])
+        violation = policy.check(record(license_name))
+        assert violation and violation.reason == "License name is missing"
+
+    def test_ignored_dependencies_are_skipped(self) -> None:
+        policy = Policy(deny=["GPL*"], ignore=["Some_Project"])
+        assert policy.check(record("GPL-3.0", name="some-project")) is None
+
+    def test_reviewed_license_files_are_skipped(self) -> None:
+        policy = Policy(deny=["GPL*"], ignore_shas=["sha"])
+        assert policy.check(record("GPL-3.0")) is None
+
+    def test_evaluate_returns_all_violations(self) -> None:
+        policy = Policy.from_config({"deny": ["GPL*"]})
+        records = [record("MIT"), record("GPL-2.0"), record("GPL-3.0")]
+        assert [x.record for x in policy.evaluate(records)] == records[1:]
@@ -1,13 +1,29 @@
-from typing import Union
+import io
+import json
+import os
+import re
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Iterator, Optional, Union
 from unittest.mock import MagicMock, patch
 
 import pytest
-from httpx import HTTPStatusError, Response
+from httpx import ConnectError, Response
 from httpx._types import URLTypes
+from packaging.specifiers import SpecifierSet
 
-from license_tracker import exceptions
-from license_tracker.models import Dependency, License
-from license_tracker.providers import GithubClient, PypiClient, httpx
+from license_tracker.exceptions import BudgetExhausted
+from license_tracker.models import Dependency, License, Resolution, Stage
+from license_tracker.providers import (
+    GithubClient,
+    GithubGraphQLClient,
+    PypiClient,
+    WheelClient,
+    httpx,
+)
 
 
 @pytest.fixture
@@ -46,6 +62,378 @@ def pypi_response() -> PypiResponseType:
     return {"info": {"project_urls": {"Source": "https://github.com/org/project/"}}}
 
 
+@pytest.fixture
+def wheel_url() -> str:
+    return "https://files.pythonhosted.org/packages/project-1.2.3-py3-none-any.whl"
+
+
+@pytest.fixture
+def wheel_content() -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(
+            "project/_speedups.so", os.urandom(100_000), zipfile.ZIP_STORED
+        )
+        archive.writestr("project-1.2.3.dist-info/LICENSE", "Lorem ipsum")
+        archive.writestr("project-1.2.3.dist-info/licenses/NOTICE.md", "dolor sit")
+        archive.writestr("project-1.2.3.dist-info/METADATA", "Name: project")
+    return buffer.getvalue()
+
+
+def range_response(content: bytes, **kwargs: Any) -> Response:
+    """
+    Serve given content the way a file server supporting Range requests would
+    """
+
+    byte_range = kwargs["headers"]["Range"].removeprefix("bytes=")
+    start_str, end_str = byte_range.split("-")
+    if not start_str:
+        start, end = max(len(content) - int(end_str), 0), len(content) - 1
+    else:
+        start, end = int(start_str), min(int(end_str), len(content) - 1)
+    return Response(
+        status_code=206,
+        content=content[start : end + 1],
+        headers={"Content-Range": f"bytes {start}-{end}/{len(content)}"},
+        request=MagicMock(),
+    )
+
+
+class TestWheelClient:
+    def test__select_url_prefers_wheels(self, wheel_url: str) -> None:
+        urls = [
+            {"packagetype": "sdist", "url": "https://example.org/project.tar.gz"},
+            {"packagetype": "bdist_wheel", "url": wheel_url},
+        ]
+        assert WheelClient._select_url(urls) == wheel_url
+
+    def test__select_url_skips_non_zip_archives(self) -> None:
+        urls = [{"packagetype": "sdist", "url": "https://example.org/project.tar.gz"}]
+        assert WheelClient._select_url(urls) is None
+
+    @patch.object(httpx, "get")
+    def test_get_licenses_fetches_only_license_members(
+        self,
+        patched_get: MagicMock,
+        wheel_url: str,
+        wheel_content: bytes,
+        resolution: Resolution,
+    ) -> None:
+        transferred = []
+
+        def serve(url: str, **kwargs: Any) -> Response:
+            response = range_response(wheel_content, **kwargs)
+            transferred.append(len(response.content))
+            return response
+
+        patched_get.side_effect = serve
+
+        result = WheelClient().get_licenses(
+            [{"packagetype": "bdist_wheel", "url": wheel_url}], resolution
+        )
+
+        assert [(x.filename, x.raw_content) for x in result] == [
+            ("LICENSE", "Lorem ipsum"),
+            ("NOTICE.md", "dolor sit"),
+        ]
+        assert result[0].url == f"{wheel_url}#project-1.2.3.dist-info/LICENSE"
+        # git blob sha, the same GitHub reports for a file with identical contents
+        assert result[0].sha == "e5d353447b81f8c1b684622a1c4010ec722df990"
+        assert sum(transferred) < len(wheel_content)
+        # tail + two license members
+        assert patched_get.call_count == 3
+
+    @patch.object(httpx, "get")
+    def test_get_licenses_falls_back_to_full_download(
+        self,
+        patched_get: MagicMock,
+        wheel_url: str,
+        wheel_content: bytes,
+        resolution: Resolution,
+    ) -> None:
+        patched_get.return_value = Response(
+            status_code=200, content=wheel_content, request=MagicMock()
+        )
+
+        result = WheelClient().get_licenses(
+            [{"packagetype": "bdist_wheel", "url": wheel_url}], resolution
+        )
+
+        assert [x.filename for x in result] == ["LICENSE", "NOTICE.md"]
+        patched_get.assert_called_once()
+
+    @patch.object(httpx, "get")
+    def test_get_licenses_returns_empty_list_for_broken_archive(
+        self, patched_get: MagicMock, wheel_url: str, resolution: Resolution
+    ) -> None:
+        patched_get.return_value = Response(
+            status_code=200, content=b"not a zip", request=MagicMock()
+        )
+
+        assert not WheelClient().get_licenses(
+            [{"packagetype": "bdist_wheel", "url": wheel_url}], resolution
+        )
+
+    @patch.object(httpx, "get")
+    def test_get_licenses_keeps_members_that_could_be_extracted(
+        self,
+        patched_get: MagicMock,
+        wheel_url: str,
+        wheel_content: bytes,
+        resolution: Resolution,
+    ) -> None:
+        notice_offset = next(
+            x.header_offset
+            for x in zipfile.ZipFile(io.BytesIO(wheel_content)).infolist()
+            if x.filename.endswith("NOTICE.md")
+        )
+
+        def serve(url: str, **kwargs: Any) -> Response:
+            if kwargs["headers"]["Range"].startswith(f"bytes={notice_offset}-"):
+                return Response(status_code=500, request=MagicMock())
+            return range_response(wheel_content, **kwargs)
+
+        patched_get.side_effect = serve
+
+        result = WheelClient().get_licenses(
+            [{"packagetype": "bdist_wheel", "url": wheel_url}], resolution
+        )
+
+        assert [x.filename for x in result] == ["LICENSE"]
+        assert [(x.stage, x.message) for x in resolution.errors] == [
+            (
+                Stage.DOWNLOAD,
+                "Could not extract project-1.2.3.dist-info/licenses/NOTICE.md",
+            )
+        ]
+
+    @pytest.mark.parametrize("content_range", [None, "bytes 0-99/*"])
+    @patch.object(httpx, "get")
+    def test_get_licenses_returns_empty_list_when_size_is_unknown(
+        self,
+        patched_get: MagicMock,
+        content_range: Optional[str],
+        wheel_url: str,
+        wheel_content: bytes,
+        resolution: Resolution,
+    ) -> None:
+        patched_get.return_value = Response(
+            status_code=206,
+            content=wheel_content[-100:],
+            headers={"Content-Range": content_range} if content_range else {},
+            request=MagicMock(),
+        )
+
+        assert not WheelClient().get_licenses(
+            [{"packagetype": "bdist_wheel", "url": wheel_url}], resolution
+        )
+
+
+class FakeGraphQLServer(ThreadingHTTPServer):
+    """
+    Understands just enough of GitHub's GraphQL API to serve queries sent by
+    GithubGraphQLClient
+    """
+
+    ALIAS_PATTERN = re.compile(
+        r'(r\d+): repository\(owner: "(.*?)", name: "(.*?)"\) '
+        r'\{ object\(expression: "(.*?)"\)'
+    )
+
+    def __init__(self, max_aliases: int) -> None:
+        super().__init__(("127.0.0.1", 0), FakeGraphQLHandler)
+        self.max_aliases = max_aliases
+        # number of upcoming requests that fail with 500
+        self.failures = 0
+        self.queries: list[str] = []
+        self.repositories: dict[tuple[str, str, str], dict[str, str]] = {}
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/graphql"
+
+    def resolve(self, query: str) -> dict[str, Any]:
+        self.queries.append(query)
+        aliases = self.ALIAS_PATTERN.findall(query)
+        if len(aliases) > self.max_aliases:
+            return {"errors": [{"type": "MAX_NODE_LIMIT_EXCEEDED", "message": "!"}]}
+        data: dict[str, Any] = {}
+        for alias, owner, name, expression in aliases:
+            ref, path = expression.split(":", 1)
+            files = self.repositories.get((owner, name, ref))
+            if files is None:
+                data[alias] = {"object": None}
+            elif not path:
+                data[alias] = {
+                    "object": {
+                        "entries": [
+                            {"name": filename, "oid": f"sha-{filename}", "type": "blob"}
+                            for filename in files
+                        ]
+                    }
+                }
+            else:
+                data[alias] = {
+                    "object": {
+                        "oid": f"sha-{path}",
+                        "text": files[path],
+                        "isBinary": False,
+                    }
+                }
+        return {"data": data}
+
+
+class FakeGraphQLHandler(BaseHTTPRequestHandler):
+    server: FakeGraphQLServer
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        assert self.headers["Authorization"] == "bearer token"
+        if self.server.failures:
+            self.server.failures -= 1
+            self.send_response(500)
+            self.end_headers()
+            return
+        response = json.dumps(self.server.resolve(json.loads(body)["query"]))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(response.encode())
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+
+@pytest.fixture
+def graphql_server() -> Iterator[FakeGraphQLServer]:
+    server = FakeGraphQLServer(max_aliases=4)
+    for idx in range(10):
+        server.repositories[("org", f"project{idx}", "1.2.3")] = {
+            "LICENSE": f"License of project{idx}",
+            "setup.py": "",
+        }
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True
+    )
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class TestGithubGraphQLClient:
+    def test_fetch_licenses_returns_license_files_of_each_repository(
+        self, graphql_server: FakeGraphQLServer
+    ) -> None:
+        client = GithubGraphQLClient("token", graphql_server.url)
+
+        result = client.fetch_licenses(
+            [("org", "project0", "1.2.3"), ("org", "project1", "1.2.3")]
+        )
+
+        assert result == [
+            [
+                License(
+                    "LICENSE",
+                    f"License of project{idx}",
+                    f"https://raw.githubusercontent.com/org/project{idx}/1.2.3/LICENSE",
+                    "sha-LICENSE",
+                )
+            ]
+            for idx in range(2)
+        ]
+        # one query for directory listings and one for license contents
+        assert len(graphql_server.queries) == 2
+
+    def test_fetch_licenses_returns_none_for_missing_refs(
+        self, graphql_server: FakeGraphQLServer
+    ) -> None:
+        client = GithubGraphQLClient("token", graphql_server.url)
+        assert client.fetch_licenses([("org", "project0", "9.9.9")]) == [None]
+
+    def test_fetch_licenses_shrinks_batches_rejected_as_too_expensive(
+        self, graphql_server: FakeGraphQLServer
+    ) -> None:
+        client = GithubGraphQLClient("token", graphql_server.url)
+
+        result = client.fetch_licenses(
+            [("org", f"project{idx}", "1.2.3") for idx in range(10)]
+        )
+
+        assert [x[0].raw_content for x in result if x] == [
+            f"License of project{idx}" for idx in range(10)
+        ]
+        assert client.batch_size <= graphql_server.max_aliases
+
+    def test_concurrent_lookups_are_batched(
+        self, graphql_server: FakeGraphQLServer
+    ) -> None:
+        graphql_server.max_aliases = 100
+        client = GithubGraphQLClient("token", graphql_server.url)
+
+        with ThreadPoolExecutor(10) as executor:
+            results = list(
+                executor.map(
+                    lambda idx: client.get_licenses(
+                        f"https://github.com/org/project{idx}/", "1.2.3"
+                    ),
+                    range(10),
+                )
+            )
+
+        assert all(result and len(result) == 1 for result in results)
+        assert len(graphql_server.queries) < 10
+
+    def test_failed_lookups_are_retried(
+        self, graphql_server: FakeGraphQLServer
+    ) -> None:
+        graphql_server.failures = 1
+        client = GithubGraphQLClient("token", graphql_server.url)
+
+        with pytest.raises(httpx.HTTPStatusError):
+            client.get_licenses("https://github.com/org/project0/", "1.2.3")
+        result = client.get_licenses("https://github.com/org/project0/", "1.2.3")
+
+        assert result and result[0].raw_content == "License of project0"
+        assert not client.futures.keys() - {("org", "project0", "1.2.3")}
+
+    @patch.object(httpx, "get")
+    def test_github_client_authenticates_rest_calls_with_graphql_token(
+        self,
+        patched_get: MagicMock,
+        github_repo_url: str,
+        version: str,
+        resolution: Resolution,
+    ) -> None:
+        patched_get.return_value = Response(
+            status_code=200, request=MagicMock(), json=[{"name": "LICENSE"}]
+        )
+        client = GithubClient(GithubGraphQLClient("token"))
+
+        client._fetch_license_files(github_repo_url, version, resolution)
+
+        patched_get.assert_called_once_with(
+            "https://api.github.com/repos/org/project/contents?ref=1.2.3",
+            headers={"Authorization": "bearer token"},
+        )
+
+    @patch.object(GithubClient, "_fetch_license_files")
+    def test_github_client_uses_graphql_when_configured(
+        self,
+        mock_fetch_files: MagicMock,
+        graphql_server: FakeGraphQLServer,
+        resolution: Resolution,
+    ) -> None:
+        client = GithubClient(GithubGraphQLClient("token", graphql_server.url))
+
+        result = client.get_licenses(
+            "https://github.com/org/project3/", "1.2.3", resolution
+        )
+
+        assert [x.raw_content for x in result] == ["License of project3"]
+        mock_fetch_files.assert_not_called()
+
+
 class TestGithubClient:
     @patch.object(httpx, "get")
     def test__fetch_license_content_returns_text_of_the_license(
@@ -64,7 +452,11 @@ class TestGithubClient:
 
     @patch.object(httpx, "get")
     def test__fetch_license_files_returns_license_files(
-        self, patched_get: MagicMock, github_repo_url: str, version: str
+        self,
+        patched_get: MagicMock,
+        github_repo_url: str,
+        version: str,
+        resolution: Resolution,
     ) -> None:
         """
         Good examples of multiple license files can be found in django and packaging repo:
@@ -90,41 +482,90 @@ class TestGithubClient:
         )
         patched_get.return_value = mock_response
 
-        response = GithubClient._fetch_license_files(github_repo_url, version=version)
+        response = GithubClient()._fetch_license_files(
+            github_repo_url, version, resolution
+        )
 
         patched_get.assert_called_once_with(
             "https://api.github.com/repos/org/project/contents?ref=1.2.3"
         )
+        assert response
         for file in response:
             assert file["name"] in expected_filenames
             assert file["name"] not in unexpected_filenames
 
     @patch.object(httpx, "get")
-    def test__fetch_license_files_raises_on_second_404(
-        self, patched_get: MagicMock, github_repo_url: str, version: str
+    def test__fetch_license_files_records_missing_tag(
+        self,
+        patched_get: MagicMock,
+        github_repo_url: str,
+        version: str,
+        resolution: Resolution,
     ) -> None:
-        mock_response = Response(status_code=404, request=MagicMock(), json={})
-        patched_get.return_value = mock_response
+        patched_get.side_effect = [
+            Response(status_code=404, request=MagicMock(), json={}),
+            Response(status_code=200, request=MagicMock(), json=[{"name": "v0.1"}]),
+        ]
 
-        with pytest.raises(HTTPStatusError):
-            GithubClient._fetch_license_files(
-                github_repo_url, version=version, _failed=True
-            )
+        assert (
+            GithubClient()._fetch_license_files(github_repo_url, version, resolution)
+            is None
+        )
+        assert [x.stage for x in resolution.errors] == [Stage.TAG]
 
     @pytest.mark.parametrize("status_code", [400, 401, 429, 500, 502])
     @patch.object(httpx, "get")
-    def test__fetch_license_files_raises_on_most_4xx_5xx(
+    def test__fetch_license_files_records_most_4xx_5xx(
         self,
         patched_get: MagicMock,
         status_code: int,
         github_repo_url: str,
         version: str,
+        resolution: Resolution,
     ) -> None:
         mock_response = Response(status_code=status_code, request=MagicMock(), json={})
         patched_get.return_value = mock_response
 
-        with pytest.raises(HTTPStatusError):
-            GithubClient._fetch_license_files(github_repo_url, version=version)
+        assert (
+            GithubClient()._fetch_license_files(github_repo_url, version, resolution)
+            is None
+        )
+        assert [x.stage for x in resolution.errors] == [Stage.REPOSITORY]
+        assert str(status_code) in resolution.errors[0].message
+
+    @patch.object(httpx, "get")
+    def test__fetch_license_files_records_malformed_listing(
+        self,
+        patched_get: MagicMock,
+        github_repo_url: str,
+        version: str,
+        resolution: Resolution,
+    ) -> None:
+        patched_get.return_value = Response(
+            status_code=200, request=MagicMock(), json={"message": "Not a directory"}
+        )
+
+        assert (
+            GithubClient()._fetch_license_files(github_repo_url, version, resolution)
+            is None
+        )
+        assert [x.stage for x in resolution.errors] == [Stage.REPOSITORY]
+
+    @patch.object(httpx, "get")
+    def test__fetch_license_files_records_unreachable_github(
+        self,
+        patched_get: MagicMock,
+        github_repo_url: str,
+        version: str,
+        resolution: Resolution,
+    ) -> None:
+        patched_get.side_effect = ConnectError("Connection refused")
+
+        assert (
+            GithubClient()._fetch_license_files(github_repo_url, version, resolution)
+            is None
+        )
+        assert [x.stage for x in resolution.errors] == [Stage.REPOSITORY]
 
     @patch.object(GithubClient, "_fetch_license_files")
     @patch.object(GithubClient, "_fetch_license_content")
@@ -135,6 +576,7 @@ class TestGithubClient:
         github_repo_url: str,
         version: str,
         license_: License,
+        resolution: Resolution,
     ) -> None:
         mock_fetch_files.return_value = [
             {
@@ -155,7 +597,7 @@ class TestGithubClient:
         ]
         mock_fetch_content.side_effect = ["Lorem ipsum", "dolor sit amet"]
 
-        result = GithubClient().get_licenses(github_repo_url, version)
+        result = GithubClient().get_licenses(github_repo_url, version, resolution)
 
         expected_result = [
             license_,
@@ -171,22 +613,196 @@ class TestGithubClient:
         )
 
     @patch.object(GithubClient, "_fetch_license_files")
-    def test_get_licenses_raises_when_there_are_no_licenses(
-        self, mock_fetch_files: MagicMock, github_repo_url: str, version: str
+    def test_get_licenses_records_when_there_are_no_licenses(
+        self,
+        mock_fetch_files: MagicMock,
+        github_repo_url: str,
+        version: str,
+        resolution: Resolution,
     ) -> None:
         mock_fetch_files.return_value = []
-        with pytest.raises(exceptions.NoLicenseFound):
-            GithubClient().get_licenses(project_url=github_repo_url, version=version)
+        assert not GithubClient().get_licenses(github_repo_url, version, resolution)
+        assert [x.stage for x in resolution.errors] == [Stage.DOWNLOAD]
 
     @patch.object(GithubClient, "_fetch_license_files")
-    def test_get_licenses_raises_when_there_github_is_not_available(
-        self, mock_fetch_files: MagicMock, github_repo_url: str, version: str
+    @patch.object(GithubClient, "_fetch_license_content")
+    def test_get_licenses_keeps_files_that_could_be_downloaded(
+        self,
+        mock_fetch_content: MagicMock,
+        mock_fetch_files: MagicMock,
+        github_repo_url: str,
+        version: str,
+        resolution: Resolution,
+    ) -> None:
+        mock_fetch_files.return_value = [
+            {"name": name, "download_url": f"https://example.org/{name}", "sha": name}
+            for name in ["LICENSE", "LICENSE.BSD"]
+        ]
+        mock_fetch_content.side_effect = ["Lorem ipsum", None]
+
+        result = GithubClient().get_licenses(github_repo_url, version, resolution)
+
+        assert [x.filename for x in result] == ["LICENSE"]
+        assert [x.message for x in resolution.errors] == [
+            "Could not download LICENSE.BSD"
+        ]
+
+    @patch.object(GithubClient, "_fetch_license_files")
+    @patch.object(GithubClient, "_fetch_license_content")
+    def test_get_licenses_downloads_each_sha_once(
+        self,
+        mock_fetch_content: MagicMock,
+        mock_fetch_files: MagicMock,
+        github_repo_url: str,
+        license_: License,
+        resolution: Resolution,
+    ) -> None:
+        mock_fetch_files.return_value = [
+            {
+                "name": license_.filename,
+                "download_url": str(license_.url),
+                "sha": license_.sha,
+            }
+        ]
+        mock_fetch_content.return_value = license_.raw_content
+        client = GithubClient()
+
+        client.get_licenses(github_repo_url, "1.0.0", resolution)
+        client.get_licenses(github_repo_url, "2.0.0", resolution)
+
+        mock_fetch_content.assert_called_once()
+
+    @patch.object(GithubClient, "_fetch_license_files")
+    @patch.object(GithubClient, "_fetch_license_content")
+    def test_concurrent_lookups_download_each_sha_once(
+        self,
+        mock_fetch_content: MagicMock,
+        mock_fetch_files: MagicMock,
+        github_repo_url: str,
+        license_: License,
+    ) -> None:
+        mock_fetch_files.return_value = [
+            {
+                "name": license_.filename,
+                "download_url": str(license_.url),
+                "sha": license_.sha,
+            }
+        ]
+
+        def fetch(url: Any) -> str:
+            # keep the first download in flight while others look the sha up
+            time.sleep(0.05)
+            return license_.raw_content
+
+        mock_fetch_content.side_effect = fetch
+        client = GithubClient()
+
+        with ThreadPoolExecutor(4) as executor:
+            results = list(
+                executor.map(
+                    lambda x: client.get_licenses(
+                        github_repo_url, x, Resolution("project", x)
+                    ),
+                    ["1.0", "1.1", "1.2", "1.3"],
+                )
+            )
+
+        mock_fetch_content.assert_called_once()
+        assert all(x[0].raw_content == license_.raw_content for x in results)
+
+    @patch.object(GithubClient, "_fetch_license_files")
+    @patch.object(GithubClient, "_fetch_license_content")
+    def test_get_licenses_retries_failed_downloads(
+        self,
+        mock_fetch_content: MagicMock,
+        mock_fetch_files: MagicMock,
+        github_repo_url: str,
+        license_: License,
+        resolution: Resolution,
+    ) -> None:
+        mock_fetch_files.return_value = [
+            {
+                "name": license_.filename,
+                "download_url": str(license_.url),
+                "sha": license_.sha,
+            }
+        ]
+        mock_fetch_content.side_effect = [None, license_.raw_content]
+        client = GithubClient()
+
+        assert not client.get_licenses(github_repo_url, "1.0.0", resolution)
+        assert client.get_licenses(github_repo_url, "2.0.0", resolution)
+
+    @patch.object(httpx, "get")
+    def test__fetch_license_files_falls_back_to_cached_tags(
+        self, patched_get: MagicMock, resolution: Resolution
+    ) -> None:
+        not_found = Response(status_code=404, request=MagicMock(), json={})
+        tags = Response(
+            status_code=200, request=MagicMock(), json=[{"name": "release-1.2.3"}]
+        )
+        contents = Response(
+            status_code=200, request=MagicMock(), json=[{"name": "LICENSE"}]
+        )
+        patched_get.side_effect = [not_found, tags, contents, not_found, contents]
+        project_url = "https://github.com/org/tagged-project/"
+
+        client = GithubClient()
+        for _ in range(2):
+            result = client._fetch_license_files(project_url, "1.2.3", resolution)
+            assert result == [{"name": "LICENSE"}]
+
+        tag_calls = [x for x in patched_get.call_args_list if "tags" in x.args[0]]
+        assert len(tag_calls) == 1
+
+    @patch.object(GithubClient, "_fetch_tags")
+    @patch.object(httpx, "get")
+    def test__fetch_license_files_records_exhausted_budget_of_tag_lookups(
+        self,
+        patched_get: MagicMock,
+        mock_fetch_tags: MagicMock,
+        github_repo_url: str,
+        version: str,
+        resolution: Resolution,
+    ) -> None:
+        patched_get.return_value = Response(
+            status_code=404, request=MagicMock(), json={}
+        )
+        mock_fetch_tags.side_effect = BudgetExhausted(
+            "api.github.com budget is exhausted for 3600s"
+        )
+
+        assert (
+            GithubClient()._fetch_license_files(github_repo_url, version, resolution)
+            is None
+        )
+        assert [(x.stage, "exhausted" in x.message) for x in resolution.errors] == [
+            (Stage.TAG, True)
+        ]
+
+    @patch.object(httpx, "get")
+    def test__fetch_license_files_records_and_retries_failed_tag_lookups(
+        self, patched_get: MagicMock, resolution: Resolution
     ) -> None:
-        mock_fetch_files.side_effect = HTTPStatusError(
-            "error", request=MagicMock(), response=MagicMock()
+        not_found = Response(status_code=404, request=MagicMock(), json={})
+        unavailable = Response(status_code=503, request=MagicMock(), json={})
+        tags = Response(
+            status_code=200, request=MagicMock(), json=[{"name": "release-1.2.3"}]
+        )
+        contents = Response(
+            status_code=200, request=MagicMock(), json=[{"name": "LICENSE"}]
         )
-        with pytest.raises(exceptions.NoLicenseFound):
-            GithubClient().get_licenses(project_url=github_repo_url, version=version)
+        patched_get.side_effect = [not_found, unavailable, not_found, tags, contents]
+        client = GithubClient()
+        project_url = "https://github.com/org/tagged-project/"
+
+        assert client._fetch_license_files(project_url, "1.2.3", resolution) is None
+        assert [(x.stage, "503" in x.message) for x in resolution.errors] == [
+            (Stage.TAG, True)
+        ]
+        assert client._fetch_license_files(
+            project_url, "1.2.3", Resolution("tagged-project", "1.2.3")
+        ) == [{"name": "LICENSE"}]
 
     def test_get_versioned_project_url(
         self, github_repo_url: str, version: str
@@ -199,11 +815,21 @@ class TestGithubClient:
 
 class TestPypiClient:
     def test__build_url_calls_versioned_api_if_possible(self, version: str) -> None:
-        assert f"{PypiClient.HOST}test/json" == PypiClient._build_url("test", None)
-        assert f"{PypiClient.HOST}test/{version}/json" == PypiClient._build_url(
+        assert f"{PypiClient.HOST}test/json" == PypiClient()._build_url("test", None)
+        assert f"{PypiClient.HOST}test/{version}/json" == PypiClient()._build_url(
             "test", version
         )
 
+    @pytest.mark.parametrize(
+        "host",
+        ["https://mirror.example.org/pypi", "https://mirror.example.org/pypi/"],
+    )
+    def test__build_url_uses_configured_host(self, host: str, version: str) -> None:
+        assert (
+            PypiClient(host)._build_url("test", version)
+            == f"https://mirror.example.org/pypi/test/{version}/json"
+        )
+
     @patch.object(httpx, "get")
     def test__call_calls_given_url(self, patched_get: MagicMock) -> None:
         mock_response = Response(status_code=200, request=MagicMock())
@@ -222,14 +848,12 @@ class TestPypiClient:
             == "https://github.com/django/django/"
         )
 
-    def test__get_project_raises_if_github_url_not_in_desired_keys(
+    def test__get_project_returns_none_if_github_url_not_in_desired_keys(
         self, pypi_real_project_urls: dict[str, URLTypes]
     ) -> None:
         pypi_real_project_urls.pop("Source")
 
-        with pytest.raises(Exception) as excinfo:
-            PypiClient._get_project_url(pypi_real_project_urls)
-        assert str(excinfo.value) == "Could not find project url"
+        assert PypiClient._get_project_url(pypi_real_project_urls) is None
 
     @patch.object(PypiClient, "_call")
     @patch.object(GithubClient, "get_licenses")
@@ -255,4 +879,141 @@ class TestPypiClient:
             licenses=[license_],
         )
 
-        assert expected == PypiClient().fetch_dependency_data("project", "1.2.3")
+        result = PypiClient().fetch_dependency_data("project", "1.2.3")
+
+        assert expected == result.dependency
+        assert not result.errors
+
+    @patch.object(PypiClient, "_call")
+    @patch.object(WheelClient, "get_licenses")
+    @patch.object(GithubClient, "get_licenses")
+    def test_fetch_dependency_data_prefers_licenses_from_distribution(
+        self,
+        mock_github_licenses: MagicMock,
+        mock_wheel_licenses: MagicMock,
+        mock_call: MagicMock,
+        pypi_response: PypiResponseType,
+        license_: License,
+        version: str,
+    ) -> None:
+        pypi_response["info"]["version"] = version
+        pypi_response["info"]["summary"] = "Very cool project"
+        pypi_response["info"]["license"] = "MIT"
+        mock_call.return_value = Response(status_code=200, json=pypi_response)
+        mock_wheel_licenses.return_value = [license_]
+
+        result = PypiClient().fetch_dependency_data("project", "1.2.3")
+
+        assert result.dependency and result.dependency.licenses == [license_]
+        mock_github_licenses.assert_not_called()
+
+    @pytest.mark.parametrize("wheel_used", [False, True])
+    @patch.object(PypiClient, "_call")
+    @patch.object(WheelClient, "get_licenses")
+    @patch.object(GithubClient, "get_licenses")
+    def test_fetch_dependency_data_records_wheel_failures_only_if_wheel_is_used(
+        self,
+        mock_github_licenses: MagicMock,
+        mock_wheel_licenses: MagicMock,
+        mock_call: MagicMock,
+        wheel_used: bool,
+        pypi_response: PypiResponseType,
+        license_: License,
+        version: str,
+    ) -> None:
+        pypi_response["info"]["version"] = version
+        mock_call.return_value = Response(status_code=200, json=pypi_response)
+
+        def extract(urls: Any, resolution: Resolution) -> list[License]:
+            resolution.failed(Stage.DOWNLOAD, "Could not extract LICENSE")
+            return [license_] if wheel_used else []
+
+        mock_wheel_licenses.side_effect = extract
+        mock_github_licenses.return_value = [license_]
+
+        result = PypiClient().fetch_dependency_data("project", version)
+
+        assert result.dependency and result.dependency.licenses == [license_]
+        assert result.partial == wheel_used
+
+    @patch.object(PypiClient, "_call")
+    def test_fetch_dependency_data_records_version_mismatch(
+        self, mock_call: MagicMock, pypi_response: PypiResponseType
+    ) -> None:
+        pypi_response["info"]["version"] = "2.0.0"
+        mock_call.return_value = Response(status_code=200, json=pypi_response)
+
+        result = PypiClient().fetch_dependency_data("project", "1.2.3")
+
+        assert result.dependency is None
+        assert [x.stage for x in result.errors] == [Stage.METADATA]
+
+    @pytest.mark.parametrize(
+        "response",
+        [
+            None,
+            Response(status_code=404, json={}),
+            Response(status_code=200, json={"info": {}}),
+            Response(status_code=200, text="<html>"),
+        ],
+    )
+    @patch.object(PypiClient, "_call")
+    def test_fetch_dependency_data_records_metadata_failures(
+        self, mock_call: MagicMock, response: Optional[Response]
+    ) -> None:
+        mock_call.return_value = response
+
+        result = PypiClient().fetch_dependency_data("project", "1.2.3")
+
+        assert result.dependency is None
+        assert [x.stage for x in result.errors] == [Stage.METADATA]
+
+    @patch.object(PypiClient, "_call")
+    @patch.object(GithubClient, "get_licenses")
+    def test_fetch_dependency_data_records_missing_repository(
+        self,
+        mock_github_licenses: MagicMock,
+        mock_call: MagicMock,
+        pypi_response: PypiResponseType,
+        version: str,
+    ) -> None:
+        pypi_response["info"]["version"] = version
+        pypi_response["info"]["project_urls"] = {"Homepage": "https://example.org"}
+        mock_call.return_value = Response(status_code=200, json=pypi_response)
+
+        result = PypiClient().fetch_dependency_data("project", version)
+
+        assert result.dependency is None
+        assert [x.stage for x in result.errors] == [Stage.REPOSITORY]
+        mock_github_licenses.assert_not_called()
+
+    @patch.object(PypiClient, "_call")
+    def test_fetch_releases_returns_sorted_matching_releases(
+        self,
+        mock_call: MagicMock,
+        pypi_response: PypiResponseType,
+        resolution: Resolution,
+    ) -> None:
+        pypi_response["info"]["version"] = "2.0"
+        files = [{"url": "https://example.org/project.whl"}]
+        mock_call.return_value = Response(
+            status_code=200,
+            json={
+                "info": pypi_response["info"],
+                "releases": {
+                    "0.9": files,
+                    "1.10": files,
+                    "1.2": files,
+                    "1.3": [],
+                    "1.4": [{**files[0], "yanked": True}],
+                    "2.0": files,
+                },
+            },
+        )
+
+        versions = PypiClient().fetch_releases(
+            "project", SpecifierSet(">=1.0,<2.0"), resolution
+        )
+
+        assert versions == ["1.2", "1.10"]
+        mock_call.assert_called_once_with(f"{PypiClient.HOST}project/json")
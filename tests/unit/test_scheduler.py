@@ -0,0 +1,158 @@
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+from httpx import Response
+
+from license_tracker.exceptions import BudgetExhausted
+from license_tracker.scheduler import HostLimit, Priority, Scheduler, TokenBucket, httpx
+
+
+def wait_for_waiters(scheduler: Scheduler, host: str, count: int) -> None:
+    deadline = time.monotonic() + 5
+    while len(scheduler.hosts[host].waiters) < count:
+        assert time.monotonic() < deadline, "requests were not queued"
+        time.sleep(0.01)
+
+
+class TestTokenBucket:
+    def test_reserve_takes_tokens_until_empty(self) -> None:
+        bucket = TokenBucket(rate=0.001, capacity=2)
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == 0
+        assert bucket.reserve() > 0
+
+    def test_reserve_keeps_requested_tokens(self) -> None:
+        bucket = TokenBucket(rate=0.001, capacity=3)
+        assert bucket.reserve(keep=2) == 0
+        assert bucket.reserve(keep=2) > 0
+        assert bucket.reserve() == 0
+
+    def test_limited_budget_is_held_until_reset(self) -> None:
+        bucket = TokenBucket(rate=1000, capacity=10)
+        bucket.limit(0, reset_in=0.05)
+        assert 0 < bucket.reserve() <= 0.05
+        assert int(bucket.available) == 0
+        time.sleep(0.06)
+        assert int(bucket.available) == 10
+
+    def test_limit_never_increases_budget(self) -> None:
+        bucket = TokenBucket(rate=0.001, capacity=10)
+        bucket.limit(3)
+        assert int(bucket.available) == 3
+        bucket.limit(100)
+        assert int(bucket.available) == 3
+
+
+class TestScheduler:
+    def test_queued_requests_are_served_by_priority(self) -> None:
+        scheduler = Scheduler({"example.org": HostLimit(1, rate=100, burst=100)})
+        order = []
+
+        def request(priority: Priority) -> None:
+            with scheduler.slot("example.org", priority):
+                order.append(priority)
+
+        with scheduler.slot("example.org", Priority.METADATA):
+            threads = []
+            for priority in (Priority.FALLBACK, Priority.METADATA):
+                thread = threading.Thread(target=request, args=(priority,))
+                thread.start()
+                threads.append(thread)
+                wait_for_waiters(scheduler, "example.org", len(threads))
+        for thread in threads:
+            thread.join()
+
+        assert order == [Priority.METADATA, Priority.FALLBACK]
+
+    def test_concurrency_is_capped_per_host(self) -> None:
+        scheduler = Scheduler({"example.org": HostLimit(2, rate=100, burst=100)})
+        with scheduler.slot("example.org", Priority.API), scheduler.slot(
+            "example.org", Priority.API
+        ):
+            thread = threading.Thread(
+                target=scheduler._acquire, args=("example.org", Priority.API)
+            )
+            thread.start()
+            wait_for_waiters(scheduler, "example.org", 1)
+            assert scheduler.hosts["example.org"].active == 2
+            # other hosts are not affected
+            with scheduler.slot("other.org", Priority.API):
+                assert scheduler.hosts["other.org"].active == 1
+        thread.join()
+        assert scheduler.hosts["example.org"].active == 1
+
+    @patch.object(httpx, "get")
+    def test_get_limits_budget_to_rate_limit_reported_by_server(
+        self, patched_get: MagicMock
+    ) -> None:
+        patched_get.return_value = Response(
+            status_code=200,
+            headers={"X-RateLimit-Remaining": "5"},
+            request=MagicMock(),
+        )
+        scheduler = Scheduler()
+
+        scheduler.get("https://api.github.com/repos/org/project/tags")
+
+        assert int(scheduler.hosts["api.github.com"].bucket.available) == 5
+        assert "api.github.com: 0 queued, 0 active, 5 budget" == scheduler.describe()
+
+    def test_authenticate_raises_limits_of_the_host(self) -> None:
+        scheduler = Scheduler()
+        with scheduler.slot("api.github.com", Priority.API):
+            pass
+        assert int(scheduler.hosts["api.github.com"].bucket.available) == 59
+
+        scheduler.authenticate("api.github.com")
+
+        queue = scheduler.hosts["api.github.com"]
+        assert queue.limit == Scheduler.AUTHENTICATED_LIMITS["api.github.com"]
+        assert int(queue.bucket.available) == queue.limit.burst
+
+    def test_fallbacks_leave_reserved_budget_to_other_requests(self) -> None:
+        scheduler = Scheduler({"example.org": HostLimit(4, rate=0.001, burst=4)})
+        for _ in range(2):
+            with scheduler.slot("example.org", Priority.FALLBACK):
+                pass
+
+        with pytest.raises(BudgetExhausted):
+            scheduler._acquire("example.org", Priority.FALLBACK)
+        with scheduler.slot("example.org", Priority.API):
+            pass
+
+        assert int(scheduler.hosts["example.org"].bucket.available) == 1
+        assert not scheduler.hosts["example.org"].waiters
+
+    @patch.object(httpx, "get")
+    def test_requests_fail_fast_until_server_budget_resets(
+        self, patched_get: MagicMock
+    ) -> None:
+        patched_get.return_value = Response(
+            status_code=403,
+            headers={
+                "X-RateLimit-Remaining": "0",
+                "X-RateLimit-Reset": str(int(time.time()) + 3600),
+            },
+            request=MagicMock(),
+        )
+        scheduler = Scheduler(max_wait=10)
+        url = "https://api.github.com/repos/org/project/tags"
+        scheduler.get(url)
+
+        started_at = time.monotonic()
+        with pytest.raises(BudgetExhausted):
+            scheduler.get(url)
+
+        assert time.monotonic() - started_at < 1
+        patched_get.assert_called_once()
+
+    def test_requests_queued_longer_than_max_wait_fail(self) -> None:
+        scheduler = Scheduler(
+            {"example.org": HostLimit(1, rate=100, burst=100)}, max_wait=0.05
+        )
+        with scheduler.slot("example.org", Priority.API):
+            with pytest.raises(BudgetExhausted):
+                scheduler._acquire("example.org", Priority.API)
+        assert not scheduler.hosts["example.org"].waiters
@@ -1,26 +1,285 @@
+from copy import deepcopy
+from typing import Any, Optional
 from unittest.mock import MagicMock, patch
 
-from license_tracker import exceptions
-from license_tracker.models import Dependency
-from license_tracker.providers import PypiClient
-from license_tracker.services import DependencyAnalyzer
+from httpx import Response
+from packaging.specifiers import SpecifierSet
+
+from license_tracker.database import LicenseDatabase
+from license_tracker.models import Dependency, License, Resolution, Stage
+from license_tracker.providers import PypiClient, WheelClient
+from license_tracker.services import DependencyAnalyzer, RangeAnalyzer, analyze
 
 
 class TestDependencyAnalyzer:
     @patch.object(PypiClient, "fetch_dependency_data")
-    def test_dependency_without_a_license_returns_none(
+    def test_dependency_without_a_license_is_not_returned(
+        self, mock_fetch_dependency: MagicMock, resolution: Resolution
+    ) -> None:
+        resolution.failed(Stage.DOWNLOAD, "No licenses found in repo")
+        mock_fetch_dependency.return_value = resolution
+        result = DependencyAnalyzer(resolution.name, resolution.version)()
+        assert result.dependency is None
+        assert result.errors
+
+    @patch.object(PypiClient, "fetch_dependency_data")
+    def test_processed_dependency_gets_returned(
+        self,
+        mock_fetch_dependency: MagicMock,
+        dependency: Dependency,
+        resolution: Resolution,
+    ) -> None:
+        resolution.dependency = dependency
+        mock_fetch_dependency.return_value = resolution
+        result = DependencyAnalyzer(dependency.name, dependency.version)()
+        assert result.dependency == dependency
+
+    @patch.object(PypiClient, "fetch_dependency_data")
+    def test_dependency_from_database_is_not_fetched(
+        self, mock_fetch_dependency: MagicMock, dependency: Dependency
+    ) -> None:
+        database = LicenseDatabase(":memory:")
+        database.add(dependency)
+        analyzer = DependencyAnalyzer(
+            dependency.name, dependency.version, database=database
+        )
+        assert analyzer().dependency == dependency
+        mock_fetch_dependency.assert_not_called()
+
+    @patch.object(PypiClient, "fetch_dependency_data")
+    def test_unpinned_dependency_is_fetched_despite_database(
+        self,
+        mock_fetch_dependency: MagicMock,
+        dependency: Dependency,
+        resolution: Resolution,
+    ) -> None:
+        database = LicenseDatabase(":memory:")
+        database.add(dependency)
+        latest = deepcopy(dependency)
+        latest.version = "2.0.0"
+        resolution.dependency = latest
+        mock_fetch_dependency.return_value = resolution
+
+        result = DependencyAnalyzer(dependency.name, None, database=database)()
+
+        assert result.dependency == latest
+        mock_fetch_dependency.assert_called_once_with(dependency.name, None)
+
+    @patch.object(PypiClient, "fetch_dependency_data")
+    def test_offline_mode_uses_latest_stored_unpinned_dependency(
+        self, mock_fetch_dependency: MagicMock, dependency: Dependency
+    ) -> None:
+        database = LicenseDatabase(":memory:")
+        database.add(dependency)
+        analyzer = DependencyAnalyzer(
+            dependency.name, None, database=database, offline=True
+        )
+        assert analyzer().dependency == dependency
+        mock_fetch_dependency.assert_not_called()
+
+    @patch.object(PypiClient, "fetch_dependency_data")
+    def test_fetched_dependency_is_stored_in_database(
+        self,
+        mock_fetch_dependency: MagicMock,
+        dependency: Dependency,
+        resolution: Resolution,
+    ) -> None:
+        resolution.dependency = dependency
+        mock_fetch_dependency.return_value = resolution
+        database = LicenseDatabase(":memory:")
+        DependencyAnalyzer(dependency.name, dependency.version, database=database)()
+        assert database.get(dependency.name, dependency.version) == dependency
+
+    @patch.object(PypiClient, "fetch_dependency_data")
+    def test_partially_fetched_dependency_is_not_stored_in_database(
+        self,
+        mock_fetch_dependency: MagicMock,
+        dependency: Dependency,
+        resolution: Resolution,
+    ) -> None:
+        resolution.dependency = dependency
+        resolution.failed(Stage.DOWNLOAD, "Could not download LICENSE.BSD")
+        mock_fetch_dependency.return_value = resolution
+        database = LicenseDatabase(":memory:")
+
+        result = DependencyAnalyzer(
+            dependency.name, dependency.version, database=database
+        )()
+
+        assert result.partial
+        assert database.get(dependency.name, dependency.version) is None
+
+    @patch.object(PypiClient, "fetch_dependency_data")
+    def test_offline_mode_does_not_fetch_missing_dependencies(
         self, mock_fetch_dependency: MagicMock, package_name: str, version: str
     ) -> None:
-        mock_fetch_dependency.side_effect = exceptions.NoLicenseFound(
-            "Error message", name=package_name, version=version
+        analyzer = DependencyAnalyzer(
+            package_name, version, database=LicenseDatabase(":memory:"), offline=True
         )
-        assert not DependencyAnalyzer(package_name, version)()
+        assert analyzer().dependency is None
+        mock_fetch_dependency.assert_not_called()
 
+
+class TestRangeAnalyzer:
+    @patch.object(PypiClient, "fetch_releases")
     @patch.object(PypiClient, "fetch_dependency_data")
-    def test_processed_dependency_gets_returned(
+    def test_only_releases_with_changed_licenses_are_returned(
+        self,
+        mock_fetch_dependency: MagicMock,
+        mock_fetch_releases: MagicMock,
+        dependency: Dependency,
+        license_: License,
+    ) -> None:
+        shas = {"1.0": "a", "1.1": "a", "1.2": "b", "1.3": "b", "1.4": "a"}
+        mock_fetch_releases.return_value = list(shas)
+
+        def fetch(name: str, version: str) -> Resolution:
+            result = deepcopy(dependency)
+            result.version = version
+            result.licenses[0].sha = shas[version]
+            return Resolution(name, version, result)
+
+        mock_fetch_dependency.side_effect = fetch
+
+        result = RangeAnalyzer(dependency.name, SpecifierSet(">=1.0"))()
+
+        assert [x.version for x in result] == ["1.0", "1.2", "1.4"]
+
+    @patch.object(PypiClient, "fetch_releases")
+    @patch.object(PypiClient, "fetch_dependency_data")
+    def test_failed_releases_are_reported_but_not_exported(
+        self,
+        mock_fetch_dependency: MagicMock,
+        mock_fetch_releases: MagicMock,
+        dependency: Dependency,
+    ) -> None:
+        mock_fetch_releases.return_value = ["1.0", "1.1"]
+
+        def fetch(name: str, version: str) -> Resolution:
+            resolution = Resolution(name, version)
+            if version == "1.1":
+                resolution.failed(Stage.REPOSITORY, "Could not list files")
+            else:
+                resolution.dependency = dependency
+            return resolution
+
+        mock_fetch_dependency.side_effect = fetch
+
+        result = RangeAnalyzer(dependency.name, SpecifierSet(">=1.0"))()
+
+        assert [(x.version, x.dependency is None) for x in result] == [
+            ("1.0", False),
+            ("1.1", True),
+        ]
+
+    @patch.object(PypiClient, "fetch_releases")
+    def test_failed_project_lookup_is_returned(
+        self, mock_fetch_releases: MagicMock, package_name: str
+    ) -> None:
+        def fetch(name: str, specifier: Any, resolution: Resolution) -> None:
+            resolution.failed(Stage.METADATA, "Could not fetch project")
+
+        mock_fetch_releases.side_effect = fetch
+
+        (result,) = RangeAnalyzer(package_name, SpecifierSet(">=1.0"))()
+
+        assert [x.stage for x in result.errors] == [Stage.METADATA]
+
+    @patch.object(PypiClient, "fetch_releases")
+    @patch.object(PypiClient, "fetch_dependency_data")
+    def test_releases_stored_in_database_are_not_fetched(
+        self,
+        mock_fetch_dependency: MagicMock,
+        mock_fetch_releases: MagicMock,
+        dependency: Dependency,
+    ) -> None:
+        database = LicenseDatabase(":memory:")
+        database.add(dependency)
+        mock_fetch_releases.return_value = [dependency.version]
+
+        result = RangeAnalyzer(
+            dependency.name, SpecifierSet(">=1.0"), database=database
+        )()
+
+        assert [x.dependency for x in result] == [dependency]
+        mock_fetch_dependency.assert_not_called()
+
+    @patch.object(PypiClient, "_call")
+    @patch.object(WheelClient, "get_licenses")
+    def test_each_release_is_stored_with_its_own_license_name(
+        self,
+        mock_wheel_licenses: MagicMock,
+        mock_call: MagicMock,
+        license_: License,
+    ) -> None:
+        license_names = {"1.0": "GPL-3.0", "2.0": "MIT"}
+        files = [{"packagetype": "bdist_wheel", "url": "https://example.org/a.whl"}]
+
+        def call(url: str) -> Response:
+            if url == "https://pypi.org/pypi/project/json":
+                content = {
+                    "info": {"version": "2.0", "license": "MIT"},
+                    "releases": {version: files for version in license_names},
+                }
+            else:
+                version = url.split("/")[-2]
+                content = {
+                    "info": {"version": version, "license": license_names[version]},
+                    "urls": files,
+                }
+            return Response(status_code=200, json=content)
+
+        mock_call.side_effect = call
+        mock_wheel_licenses.return_value = [license_]
+        database = LicenseDatabase(":memory:")
+
+        RangeAnalyzer("project", SpecifierSet(">=1.0"), database=database)()
+
+        assert sorted((x.version, x.license_name) for x in database.records()) == [
+            ("1.0", "GPL-3.0"),
+            ("2.0", "MIT"),
+        ]
+
+    def test_offline_mode_uses_releases_from_database(
+        self, dependency: Dependency
+    ) -> None:
+        database = LicenseDatabase(":memory:")
+        for version in ["0.9", "1.2.3", "2.0"]:
+            dependency.version = version
+            database.add(dependency)
+
+        result = RangeAnalyzer(
+            dependency.name, SpecifierSet(">=1.0,<2.0"), database=database, offline=True
+        )()
+
+        assert [x.version for x in result] == ["1.2.3"]
+
+
+class TestAnalyze:
+    @patch.object(PypiClient, "fetch_dependency_data")
+    def test_unexpected_error_fails_only_its_dependency(
         self,
         mock_fetch_dependency: MagicMock,
         dependency: Dependency,
+        resolution: Resolution,
     ) -> None:
-        mock_fetch_dependency.return_value = dependency
-        assert DependencyAnalyzer(dependency.name, dependency.version)() == dependency
+        resolution.dependency = dependency
+
+        def fetch(name: str, version: Optional[str]) -> Resolution:
+            if name == "broken":
+                raise TypeError("string indices must be integers")
+            return resolution
+
+        mock_fetch_dependency.side_effect = fetch
+
+        broken, fine = [
+            analyze(DependencyAnalyzer(name, "1.0"))
+            for name in ["broken", dependency.name]
+        ]
+
+        assert [(x.name, x.version, x.dependency) for x in broken] == [
+            ("broken", "1.0", None)
+        ]
+        assert [x.stage for x in broken[0].errors] == [Stage.UNEXPECTED]
+        assert "TypeError" in broken[0].errors[0].message
+        assert [x.dependency for x in fine] == [dependency]